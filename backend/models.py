@@ -15,6 +15,31 @@ class MarketSelectionMethod(str, Enum):
     MANUAL = "manual"
     AUTOMATIC = "automatic"
 
+class OptimizationMethod(str, Enum):
+    RANDOM_SEARCH = "random_search"
+    SWAP_SEARCH = "swap_search"
+    MILP = "milp"
+    ANNEALING = "annealing"
+    MATCHED_PAIRS = "matched_pairs"
+    RERANDOMIZATION = "rerandomization"
+
+class CoolingSchedule(str, Enum):
+    GEOMETRIC = "geometric"
+    LINEAR = "linear"
+    LOGARITHMIC = "logarithmic"
+
+class StratificationKey(str, Enum):
+    POPULATION = "population"
+    CONVERSIONS = "conversions"
+    SPEND = "spend"
+    STATE = "state"
+    DMA = "dma"
+
+class BalanceObjective(str, Enum):
+    STANDARDIZED_MEAN_DIFFERENCE = "standardized_mean_difference"  # mean |diff| over standardized metrics
+    MAHALANOBIS = "mahalanobis"  # covariance-aware distance between group means
+    PRE_PERIOD_RMSE = "pre_period_rmse"  # fit of the groups' daily KPI series over a stored panel
+
 class TestStatus(str, Enum):
     DRAFT = "draft"
     QUALITY_REVIEW = "quality_review"
@@ -34,6 +59,8 @@ class GeographicUnit(BaseModel):
     conversion_rate: float
     cpm: float
     ctr: float
+    state: Optional[str] = None
+    dma: Optional[str] = None
 
 class TestObjective(BaseModel):
     type: ObjectiveType
@@ -131,6 +158,38 @@ class OptimizationRequest(BaseModel):
     objectives: List[str]
     constraints: Dict[str, Any]
     treatment_percentage: float = 0.5
+    method: OptimizationMethod = OptimizationMethod.RANDOM_SEARCH
+    max_iterations: int = 10000
+    random_seed: Optional[int] = None
+    batch_size: int = 256  # candidates scored per vectorized block
+    time_limit_seconds: float = 10.0  # wall-clock budget for MILP and annealing
+    n_chains: int = 1  # independent search chains, run across a process pool when > 1
+    n_jobs: Optional[int] = None  # worker processes, defaults to the CPU count
+    # Simulated annealing
+    cooling_schedule: CoolingSchedule = CoolingSchedule.GEOMETRIC
+    initial_temperature: Optional[float] = None  # derived from sampled swap deltas when unset
+    cooling_rate: float = 0.999
+    plateau_iterations: int = 2000  # iterations without improvement before declaring convergence
+    convergence_tolerance: float = 1e-4  # relative improvement that resets the plateau counter
+    # Blocked randomization: optimize independently within strata, then merge
+    stratify_by: Optional[StratificationKey] = None
+    n_strata: int = 10  # quantile buckets for population/conversions/spend
+    pair_block_size: int = 500  # units per linear_sum_assignment block in matched-pairs mode
+    # Multi-cell design: share of units per cell, cell 0 is the holdout (overrides treatment_percentage)
+    cell_proportions: Optional[List[float]] = None
+    # Warm start: previous design to repair and refine instead of searching from scratch
+    initial_treatment_units: Optional[List[str]] = None
+    initial_control_units: Optional[List[str]] = None
+    warm_start_max_steps: int = 1000  # cap on greedy refinement swaps after a warm start
+    # float32 metrics and memory-bounded candidate blocks; peak memory is traced and reported
+    low_memory: bool = False
+    balance_objective: BalanceObjective = BalanceObjective.STANDARDIZED_MEAN_DIFFERENCE
+    # Pre-period panel for the pre_period_rmse objective (see panel_store)
+    panel_id: Optional[str] = None
+    panel_kpi: str = "conversions"
+    # Rerandomization: accept random draws whose balance score is below the threshold
+    acceptance_threshold: Optional[float] = None
+    n_accepted: int = 1  # accepted draws to collect before stopping
 
 class OptimizationResult(BaseModel):
     treatment_units: List[str]
@@ -139,3 +198,118 @@ class OptimizationResult(BaseModel):
     optimization_score: float
     iterations: int
     convergence_achieved: bool
+    milp_objective: Optional[float] = None  # exact mode only: the linear balance objective mean(e) of the returned assignment
+    n_chains: int = 1
+    chain_scores: List[float] = []
+    n_strata: Optional[int] = None
+    pair_distances: List[Dict[str, Any]] = []  # matched-pairs mode only
+    cell_units: List[List[str]] = []  # multi-cell mode only, cell 0 is the holdout
+    served_from_cache: bool = False
+    peak_memory_mb: Optional[float] = None  # low_memory mode only
+    # Rerandomization mode only: the accepted randomization distribution
+    acceptance_rate: Optional[float] = None
+    accepted_scores: List[float] = []
+    accepted_treatment_units: List[List[str]] = []
+
+class ResamplingResult(BaseModel):
+    estimate: float  # ratio-estimator lift of treatment vs control on the design's own data
+    bootstrap_bias: float
+    bootstrap_variance: float
+    jackknife_bias: float
+    jackknife_variance: float
+    confidence_interval: List[float]  # bootstrap percentile interval
+    coverage: float  # share of resamples whose jackknife-SE interval covers the estimate
+    n_bootstrap: int
+    confidence_level: float = 0.95
+
+class PowerSimulationRequest(BaseModel):
+    units: List[GeographicUnit]
+    treatment_percentage: float = 0.5
+    effect_sizes: List[float] = [0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3]  # relative lifts to inject
+    n_simulations: int = 2000  # placebo assignments per effect size
+    significance_level: float = 0.05
+    target_power: float = 0.8
+    random_seed: Optional[int] = None
+    n_jobs: Optional[int] = None  # worker processes, defaults to the CPU count
+
+class PowerSimulationResult(BaseModel):
+    effect_sizes: List[float]
+    power: List[float]  # empirical power at each effect size
+    minimum_detectable_effect: Optional[float]  # interpolated; None if target power is never reached
+    critical_values: List[float]  # [lower, upper] of the placebo (null) lift distribution
+    null_standard_error: float  # std of the lift estimate across placebo assignments
+    n_simulations: int
+    significance_level: float
+    target_power: float
+    estimator: str = "ratio"  # lift in conversions per population, treatment vs control
+
+class PowerGridRequest(BaseModel):
+    treatment_group: TestGroup
+    control_group: TestGroup
+    durations: List[int] = [7, 14, 21, 28, 42, 56]  # test length in days
+    expected_effects: List[float] = [0.01, 0.02, 0.05, 0.1, 0.15, 0.2]
+    treatment_shares: List[float] = [0.5]
+    base_duration_days: int = 14  # duration the groups' historical variance corresponds to
+
+class PowerGridResult(BaseModel):
+    durations: List[int]
+    expected_effects: List[float]
+    treatment_shares: List[float]
+    power: List[List[List[float]]]  # [duration][effect][share]
+    minimum_detectable_effect: List[List[float]]  # [duration][share]
+    significance_level: float
+    target_power: float
+
+class SequentialMonitorConfig(BaseModel):
+    kpi: str = "conversions"
+    alpha: float = 0.05  # always-valid type I error over the whole monitoring period
+    mixture_variance: Optional[float] = None  # tau^2 of the normal mixture; the running daily variance when unset
+    min_observations: int = 14  # burn-in days; shorter runs let the plug-in variance inflate type I error
+
+class DailyObservation(BaseModel):
+    date: date
+    treatment_value: float  # KPI total of the treatment group for the day
+    control_value: float  # KPI total of the control group, scaled to the treatment group's size
+
+class SequentialEvaluation(BaseModel):
+    test_id: str
+    kpi: str
+    n_days: int
+    last_date: Optional[date] = None
+    mean_difference: Optional[float] = None  # mean daily treatment - control
+    relative_lift: Optional[float] = None
+    daily_variance: Optional[float] = None
+    confidence_sequence: Optional[List[float]] = None  # running intersection, valid at every day
+    always_valid_p_value: float = 1.0
+    alpha: float
+    decision: str = "continue"  # "continue" or "reject_null"
+    rejected_on: Optional[date] = None
+
+class BudgetDesign(BaseModel):
+    design_id: Optional[str] = None
+    treatment_group: TestGroup
+    control_group: TestGroup
+    incremental_cpa: Optional[float] = None  # cost per incremental conversion; falls back to the request's
+
+class PowerSolverRequest(BaseModel):
+    designs: List[BudgetDesign]
+    durations: List[int] = [7, 14, 21, 28, 42, 56]  # candidate test lengths in days
+    min_power: float = 0.8
+    incremental_cpa: Optional[float] = None
+    max_daily_budget: Optional[float] = None  # durations needing more per day are infeasible
+    base_duration_days: int = 14  # duration the groups' historical variance corresponds to
+
+class BudgetSolution(BaseModel):
+    design_id: Optional[str]
+    daily_budget: List[Optional[float]]  # minimum per duration; None where above max_daily_budget
+    total_budget: List[Optional[float]]
+    recommended_daily_budget: Optional[float] = None  # cheapest feasible combination in total spend
+    recommended_duration_days: Optional[int] = None
+    recommended_total_budget: Optional[float] = None
+    power: Optional[float] = None  # at the recommended combination
+
+class PowerSolverResult(BaseModel):
+    durations: List[int]
+    designs: List[BudgetSolution]
+    min_power: float
+    significance_level: float
@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, Future
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+from models import OptimizationRequest
+from statistical_engine import StatisticalMatchingEngine
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue already holds max_queued_jobs pending jobs"""
+
+class JobNotCancellableError(Exception):
+    """Raised when a running job's search mode never checks the cancellation flag"""
+
+class OptimizationJobManager:
+    """
+    Background job runner for optimize-assignment requests.
+    
+    Jobs execute in a dedicated process pool, so long optimizations never
+    block the API workers. max_running_jobs caps concurrent jobs (pool size)
+    and max_queued_jobs caps how many may wait behind them. Job documents,
+    final results and errors are persisted to Mongo; live progress and
+    cancellation flags are shared with the workers through a multiprocessing
+    Manager and merged into the status view while a job runs. Only
+    single-chain searches poll the cancellation flag, so running MILP,
+    multi-chain, stratified and matched-pairs jobs cannot be cancelled.
+    """
+    
+    def __init__(self, db, max_running_jobs: Optional[int] = None, max_queued_jobs: int = 50):
+        self.collection = db.optimization_jobs
+        self.max_running_jobs = max_running_jobs or max(1, (os.cpu_count() or 2) // 2)
+        self.max_queued_jobs = max_queued_jobs
+        
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._cancelled = None
+        self._engine = StatisticalMatchingEngine()
+        self._futures: Dict[str, Future] = {}
+        self._cancellable: Dict[str, bool] = {}
+        # Done-callbacks remove finished jobs from another thread
+        self._lock = threading.Lock()
+    
+    def _ensure_started(self):
+        """Start the worker pool and the shared-state manager on first use"""
+        if self._executor is None:
+            self._manager = multiprocessing.Manager()
+            self._progress = self._manager.dict()
+            self._cancelled = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_running_jobs)
+    
+    def submit(self, request: OptimizationRequest, panel: Optional[np.ndarray] = None) -> str:
+        """Queue an optimization request (with its pre-period panel, if any) and return its job id"""
+        with self._lock:
+            pending = sum(1 for future in self._futures.values() if not future.done())
+        if pending >= self.max_running_jobs + self.max_queued_jobs:
+            raise JobQueueFullError(f"{pending} optimization jobs already pending")
+        
+        self._ensure_started()
+        job_id = str(uuid.uuid4())
+        
+        self.collection.insert_one({
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "request_summary": {
+                "n_units": len(request.available_units),
+                "method": request.method.value,
+                "treatment_percentage": request.treatment_percentage,
+                "max_iterations": request.max_iterations
+            },
+            "progress": None,
+            "result": None,
+            "error": None
+        })
+        
+        future = self._executor.submit(
+            _run_optimization_job, job_id, request.dict(), self._progress, self._cancelled, panel
+        )
+        with self._lock:
+            self._futures[job_id] = future
+            self._cancellable[job_id] = self._engine.supports_cancellation(request)
+        future.add_done_callback(lambda done: self._on_job_done(job_id, done))
+        
+        return job_id
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current job document, with live progress merged in while the job runs"""
+        job = self.collection.find_one({"job_id": job_id}, {"_id": 0})
+        if job is None:
+            return None
+        
+        live = self._progress.get(job_id) if self._progress is not None else None
+        if live is not None and job["status"] in ("queued", "running"):
+            job["status"] = "running"
+            job["started_at"] = live.get("started_at")
+            job["progress"] = {key: value for key, value in live.items() if key != "started_at"}
+        
+        return job
+    
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs, without their results"""
+        cursor = self.collection.find({}, {"_id": 0, "result": 0}).sort("created_at", -1).limit(limit)
+        return list(cursor)
+    
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job. Queued jobs are dropped; running jobs are asked to stop
+        and keep the best assignment found so far. Returns False if the job is
+        unknown or already finished; raises JobNotCancellableError if it is
+        running in a mode that never checks the cancellation flag.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            cancellable = self._cancellable.get(job_id, False)
+        if future is None or future.done():
+            return False
+        
+        if future.cancel():
+            self._mark_finished(job_id, "cancelled")
+        elif cancellable:
+            self._cancelled[job_id] = True
+        else:
+            raise JobNotCancellableError(
+                "This job's optimization mode cannot be interrupted; wait for it to finish"
+            )
+        return True
+    
+    def _on_job_done(self, job_id: str, future: Future):
+        """Persist the outcome of a finished job"""
+        try:
+            if future.cancelled():
+                return  # Recorded by cancel()
+            result = future.result()
+            status = "cancelled" if self._cancelled.get(job_id) else "completed"
+            self._mark_finished(job_id, status, result=result)
+        except Exception as e:
+            self._mark_finished(job_id, "failed", error=str(e))
+        finally:
+            self._progress.pop(job_id, None)
+            self._cancelled.pop(job_id, None)
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._cancellable.pop(job_id, None)
+    
+    def _mark_finished(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                       error: Optional[str] = None):
+        update = {
+            "status": status,
+            "finished_at": datetime.now().isoformat(),
+            "result": result,
+            "error": error
+        }
+        live = self._progress.get(job_id) if self._progress is not None else None
+        if live is not None:
+            update["started_at"] = live.get("started_at")
+            update["progress"] = {key: value for key, value in live.items() if key != "started_at"}
+        
+        self.collection.update_one({"job_id": job_id}, {"$set": update})
+
+def _run_optimization_job(job_id: str, request_data: Dict[str, Any], progress, cancelled,
+                          panel: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Worker-process entry point: run one optimization, reporting progress through shared state"""
+    request = OptimizationRequest(**request_data)
+    started_at = datetime.now().isoformat()
+    progress[job_id] = {
+        "started_at": started_at,
+        "iteration": 0,
+        "max_iterations": request.max_iterations,
+        "best_score": None
+    }
+    
+    def report(iteration: int, best_score: float, best_assignment) -> bool:
+        progress[job_id] = {
+            "started_at": started_at,
+            "iteration": iteration,
+            "max_iterations": request.max_iterations,
+            "best_score": best_score
+        }
+        return bool(cancelled.get(job_id))
+    
+    engine = StatisticalMatchingEngine()
+    context = engine.design_context(request, panel=panel)
+    result = engine.optimize_geo_assignment(request, progress_callback=report, context=context)
+    return result.dict()
@@ -0,0 +1,128 @@
+from datetime import datetime
+from io import StringIO
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+from bson.binary import Binary
+
+# Value chunks stay well under Mongo's 16 MB document limit
+CHUNK_BYTES = 8 * 2 ** 20
+
+class KpiPanel:
+    """
+    Daily KPI panel: a float32 (kpi x unit x day) array with its unit ids and dates.
+    Missing unit-days are stored as 0.
+    """
+    
+    def __init__(self, panel_id: str, unit_ids: List[str], dates: List[str],
+                 kpis: List[str], values: np.ndarray):
+        self.panel_id = panel_id
+        self.unit_ids = unit_ids
+        self.dates = dates
+        self.kpis = kpis
+        self.values = values
+    
+    @classmethod
+    def from_csv(cls, panel_id: str, text: str) -> "KpiPanel":
+        """
+        Build a panel from long-format CSV: unit_id, date, then one column per KPI.
+        Units and dates are sorted; duplicate unit-days are summed.
+        """
+        frame = pd.read_csv(StringIO(text), dtype={"unit_id": str, "date": str})
+        if "unit_id" not in frame.columns or "date" not in frame.columns:
+            raise ValueError("Panel CSV needs unit_id and date columns")
+        kpis = [column for column in frame.columns if column not in ("unit_id", "date")]
+        if not kpis:
+            raise ValueError("Panel CSV needs at least one KPI column")
+        
+        unit_ids = sorted(frame["unit_id"].unique())
+        dates = sorted(frame["date"].unique())
+        rows = pd.Index(unit_ids).get_indexer(frame["unit_id"])
+        columns = pd.Index(dates).get_indexer(frame["date"])
+        
+        values = np.zeros((len(kpis), len(unit_ids), len(dates)), dtype=np.float32)
+        for k, kpi in enumerate(kpis):
+            np.add.at(values[k], (rows, columns), frame[kpi].fillna(0).to_numpy(dtype=np.float32))
+        
+        return cls(panel_id, unit_ids, dates, kpis, values)
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "panel_id": self.panel_id,
+            "kpis": self.kpis,
+            "n_units": len(self.unit_ids),
+            "n_days": len(self.dates),
+            "start_date": self.dates[0] if self.dates else None,
+            "end_date": self.dates[-1] if self.dates else None
+        }
+
+class PanelStore:
+    """
+    Mongo persistence for KPI panels.
+    Metadata (unit ids, dates, KPIs) lives in `kpi_panels`; values are raw
+    float32 bytes in `kpi_panel_values`, one document per KPI and block of units.
+    """
+    
+    def __init__(self, db):
+        self.panels = db.kpi_panels
+        self.values = db.kpi_panel_values
+    
+    def save(self, panel: KpiPanel):
+        """Store a panel, replacing any panel with the same id"""
+        self.delete(panel.panel_id)
+        
+        n_days = max(len(panel.dates), 1)
+        units_per_chunk = max(1, CHUNK_BYTES // (n_days * 4))
+        chunks = []
+        for k, kpi in enumerate(panel.kpis):
+            for start in range(0, len(panel.unit_ids), units_per_chunk):
+                block = panel.values[k, start:start + units_per_chunk]
+                chunks.append({
+                    "panel_id": panel.panel_id,
+                    "kpi": kpi,
+                    "start_unit": start,
+                    "n_units": block.shape[0],
+                    "values": Binary(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+                })
+        if chunks:
+            self.values.insert_many(chunks)
+        
+        self.panels.insert_one({
+            **panel.summary(),
+            "unit_ids": panel.unit_ids,
+            "dates": panel.dates,
+            "created_at": datetime.now().isoformat()
+        })
+    
+    def get_summary(self, panel_id: str) -> Optional[Dict[str, Any]]:
+        return self.panels.find_one({"panel_id": panel_id}, {"_id": 0, "unit_ids": 0, "dates": 0})
+    
+    def list_panels(self) -> List[Dict[str, Any]]:
+        return list(self.panels.find({}, {"_id": 0, "unit_ids": 0, "dates": 0}).sort("created_at", -1))
+    
+    def delete(self, panel_id: str) -> bool:
+        deleted = self.panels.delete_one({"panel_id": panel_id}).deleted_count
+        self.values.delete_many({"panel_id": panel_id})
+        return bool(deleted)
+    
+    def unit_series(self, panel_id: str, kpi: str, unit_ids: List[str]) -> np.ndarray:
+        """(n_units x n_days) float32 series of one KPI, rows in the order of unit_ids"""
+        meta = self.panels.find_one({"panel_id": panel_id}, {"_id": 0, "unit_ids": 1, "dates": 1, "kpis": 1})
+        if meta is None:
+            raise ValueError(f"Panel {panel_id} not found")
+        if kpi not in meta["kpis"]:
+            raise ValueError(f"Panel {panel_id} has no KPI '{kpi}' (available: {meta['kpis']})")
+        
+        rows = pd.Index(meta["unit_ids"]).get_indexer(unit_ids)
+        if np.any(rows < 0):
+            missing = [unit_id for unit_id, row in zip(unit_ids, rows) if row < 0]
+            raise ValueError(f"Panel {panel_id} has no series for units {missing[:5]}")
+        
+        n_days = len(meta["dates"])
+        series = np.empty((len(meta["unit_ids"]), n_days), dtype=np.float32)
+        for chunk in self.values.find({"panel_id": panel_id, "kpi": kpi}, {"_id": 0}):
+            block = np.frombuffer(chunk["values"], dtype=np.float32).reshape(chunk["n_units"], n_days)
+            series[chunk["start_unit"]:chunk["start_unit"] + chunk["n_units"]] = block
+        
+        return series[rows]
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from models import OptimizationRequest
+
+# Request fields that change how a result is computed but not what it is
+NON_RESULT_FIELDS = {"available_units", "n_jobs"}
+
+class OptimizationResultCache:
+    """
+    Content-addressed cache of optimize-assignment results.
+    
+    The key is a SHA-256 of the units' metric vectors (and pre-period panel
+    series, when the objective uses one), ids, states and DMAs
+    plus every request parameter that affects the result (treatment
+    percentage, objectives, constraints, method settings, seed), so the same
+    design returns the same entry no matter how the request was built.
+    Lookups hit an in-process LRU first, then the Mongo `optimization_cache`
+    collection, whose TTL index on created_at expires entries after
+    ttl_seconds. Requests without a random_seed are cached as well: the
+    stored result is one valid draw, and callers can bypass the cache to
+    draw again.
+    """
+    
+    def __init__(self, db, max_entries: int = 256, ttl_seconds: int = 24 * 3600):
+        self.collection = db.optimization_cache
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._indexed = False
+    
+    def key(self, request: OptimizationRequest, metrics: np.ndarray,
+            panel: Optional[np.ndarray] = None) -> str:
+        """Stable hash of a request, given the metrics matrix (and pre-period panel) of its units"""
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(metrics, dtype=np.float64).tobytes())
+        if panel is not None:
+            digest.update(np.ascontiguousarray(panel, dtype=np.float32).tobytes())
+        labels = [[unit.id, unit.state, unit.dma] for unit in request.available_units]
+        params = request.dict(exclude=NON_RESULT_FIELDS)
+        digest.update(json.dumps([labels, params], sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result dict for a key, or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        
+        document = self.collection.find_one({"key": key}, {"_id": 0, "result": 1})
+        if document is None:
+            return None
+        
+        self._remember(key, document["result"])
+        return document["result"]
+    
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a result dict in both tiers"""
+        self._remember(key, result)
+        self._ensure_indexes()
+        self.collection.replace_one(
+            {"key": key},
+            {"key": key, "result": result, "created_at": datetime.utcnow()},
+            upsert=True
+        )
+    
+    def _remember(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _ensure_indexes(self):
+        """Create the lookup and TTL indexes on first write"""
+        if not self._indexed:
+            self.collection.create_index("key", unique=True)
+            self.collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+            self._indexed = True
@@ -0,0 +1,175 @@
+import math
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from models import SequentialMonitorConfig, DailyObservation, SequentialEvaluation
+
+class SequentialConflictError(Exception):
+    """Raised when a monitor changed between reading and writing its statistics"""
+
+def mixture_sprt(n: int, total: float, sum_squares: float, alpha: float,
+                 mixture_variance: Optional[float] = None) -> Dict[str, float]:
+    """
+    Normal-mixture SPRT for the mean daily difference being zero, from the
+    sufficient statistics (n, sum, sum of squares) of the daily differences.
+    The variance is the running sample variance (plug-in). Returns the mixture
+    likelihood ratio, its p-value 1 / ratio, and the matching confidence
+    sequence around the running mean; all are O(1) in the number of days.
+    """
+    mean = total / n
+    variance = max((sum_squares - n * mean ** 2) / (n - 1), 1e-12)
+    tau2 = mixture_variance or variance
+    
+    shrink = variance + n * tau2
+    log_ratio = (0.5 * math.log(variance / shrink)
+                 + n ** 2 * tau2 * mean ** 2 / (2 * variance * shrink))
+    half_width = math.sqrt(
+        2 * variance * shrink / (n ** 2 * tau2) * (math.log(1 / alpha) + 0.5 * math.log(shrink / variance))
+    )
+    
+    return {
+        "mean": mean,
+        "variance": variance,
+        "log_likelihood_ratio": log_ratio,
+        "p_value": min(1.0, math.exp(-log_ratio)),
+        "lower": mean - half_width,
+        "upper": mean + half_width
+    }
+
+class SequentialMonitor:
+    """
+    Always-valid daily monitoring of active tests.
+    
+    Each test keeps one document in `sequential_monitors` with the sufficient
+    statistics of its daily treatment - control differences (count, sum, sum of
+    squares, control sum) plus the running minimum p-value and the running
+    intersection of the confidence sequence. New daily rows update these with
+    $inc/$min/$max, so each evaluation costs the same on day 5 as on day 500
+    and the raw history is never re-read. Peeking every day is safe: the
+    mixture SPRT p-value is valid at any stopping time.
+    """
+    
+    def __init__(self, db):
+        self.collection = db.sequential_monitors
+    
+    def start(self, test_id: str, config: SequentialMonitorConfig) -> SequentialEvaluation:
+        """Start (or restart from scratch) monitoring a test"""
+        self.collection.replace_one({"test_id": test_id}, {
+            "test_id": test_id,
+            "config": config.dict(),
+            "n": 0,
+            "sum_difference": 0.0,
+            "sum_squared_difference": 0.0,
+            "sum_control": 0.0,
+            "last_date": None,
+            "min_p_value": 1.0,
+            "cs_lower": None,
+            "cs_upper": None,
+            "rejected_on": None,
+            "created_at": datetime.now().isoformat()
+        }, upsert=True)
+        return self.evaluate(test_id)
+    
+    def get_state(self, test_id: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"test_id": test_id}, {"_id": 0})
+    
+    def add_observations(self, test_id: str, observations: List[DailyObservation]) -> SequentialEvaluation:
+        """
+        Fold new daily rows into a test's statistics. Rows must be later than
+        the last recorded day; each row costs O(1) and the batch is written
+        in one conditional update.
+        """
+        state = self.get_state(test_id)
+        if state is None:
+            raise ValueError(f"Sequential monitoring has not been started for test {test_id}")
+        if not observations:
+            return self._evaluation(state)
+        
+        config = SequentialMonitorConfig(**state["config"])
+        observations = sorted(observations, key=lambda row: row.date)
+        dates = [row.date.isoformat() for row in observations]
+        if len(set(dates)) != len(dates):
+            raise ValueError("Duplicate dates in observations")
+        if state["last_date"] is not None and dates[0] <= state["last_date"]:
+            raise ValueError(f"Observations must be after the last recorded day {state['last_date']}")
+        
+        n = state["n"]
+        total = state["sum_difference"]
+        sum_squares = state["sum_squared_difference"]
+        min_p_value = state["min_p_value"]
+        lower, upper = state["cs_lower"], state["cs_upper"]
+        rejected_on = state["rejected_on"]
+        
+        differences = [row.treatment_value - row.control_value for row in observations]
+        for difference, day in zip(differences, dates):
+            n += 1
+            total += difference
+            sum_squares += difference ** 2
+            if n < max(config.min_observations, 2):
+                continue
+            
+            step = mixture_sprt(n, total, sum_squares, config.alpha, config.mixture_variance)
+            min_p_value = min(min_p_value, step["p_value"])
+            lower = step["lower"] if lower is None else max(lower, step["lower"])
+            upper = step["upper"] if upper is None else min(upper, step["upper"])
+            if rejected_on is None and min_p_value <= config.alpha:
+                rejected_on = day
+        
+        update = {
+            "$inc": {
+                "n": len(observations),
+                "sum_difference": sum(differences),
+                "sum_squared_difference": sum(difference ** 2 for difference in differences),
+                "sum_control": sum(row.control_value for row in observations)
+            },
+            "$set": {
+                "last_date": dates[-1],
+                "min_p_value": min_p_value,
+                "cs_lower": lower,
+                "cs_upper": upper,
+                "rejected_on": rejected_on,
+                "updated_at": datetime.now().isoformat()
+            }
+        }
+        # Only apply on top of the statistics the evaluation above started from
+        result = self.collection.update_one({"test_id": test_id, "n": state["n"]}, update)
+        if result.matched_count == 0:
+            raise SequentialConflictError(f"Sequential statistics for test {test_id} changed concurrently")
+        
+        return self.evaluate(test_id)
+    
+    def evaluate(self, test_id: str) -> SequentialEvaluation:
+        """Current always-valid read for a test"""
+        state = self.get_state(test_id)
+        if state is None:
+            raise ValueError(f"Sequential monitoring has not been started for test {test_id}")
+        return self._evaluation(state)
+    
+    def delete(self, test_id: str) -> bool:
+        return bool(self.collection.delete_one({"test_id": test_id}).deleted_count)
+    
+    def _evaluation(self, state: Dict[str, Any]) -> SequentialEvaluation:
+        config = SequentialMonitorConfig(**state["config"])
+        n = state["n"]
+        evaluation = SequentialEvaluation(
+            test_id=state["test_id"],
+            kpi=config.kpi,
+            n_days=n,
+            last_date=state["last_date"],
+            always_valid_p_value=state["min_p_value"],
+            alpha=config.alpha,
+            decision="reject_null" if state["rejected_on"] else "continue",
+            rejected_on=state["rejected_on"]
+        )
+        if n == 0:
+            return evaluation
+        
+        mean = state["sum_difference"] / n
+        mean_control = state["sum_control"] / n
+        evaluation.mean_difference = mean
+        evaluation.relative_lift = mean / mean_control if mean_control else None
+        if n >= 2:
+            evaluation.daily_variance = max((state["sum_squared_difference"] - n * mean ** 2) / (n - 1), 0.0)
+        if state["cs_lower"] is not None:
+            evaluation.confidence_sequence = [state["cs_lower"], state["cs_upper"]]
+        return evaluation
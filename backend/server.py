@@ -1,5 +1,7 @@
-from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi import FastAPI, HTTPException, Query, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 from typing import List, Dict, Any, Optional
@@ -10,6 +12,8 @@ import requests
 from pydantic import BaseModel
 import uuid
 import asyncio
+import threading
+import numpy as np
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -23,10 +27,16 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from models import (
     GeoLiftTest, TestObjective, BudgetConfiguration, MarketSelection,
     GeographicUnit, TestGroup, QualityIndicators, StatisticalMetrics,
-    ObjectiveType, MarketSelectionMethod, TestStatus, OptimizationRequest
+    ObjectiveType, MarketSelectionMethod, TestStatus, OptimizationRequest, BalanceObjective,
+    PowerSimulationRequest, PowerGridRequest, SequentialMonitorConfig, DailyObservation,
+    PowerSolverRequest
 )
-from statistical_engine import StatisticalMatchingEngine
+from statistical_engine import StatisticalMatchingEngine, DesignContext
 from meta_data_service import MetaDataService
+from optimization_jobs import OptimizationJobManager, JobQueueFullError, JobNotCancellableError
+from result_cache import OptimizationResultCache
+from panel_store import PanelStore, KpiPanel
+from sequential_testing import SequentialMonitor, SequentialConflictError
 
 # Keep existing imports from original server
 import csv
@@ -51,6 +61,11 @@ db = client.geographic_testing
 # Initialize services
 statistical_engine = StatisticalMatchingEngine()
 meta_service = MetaDataService()
+optimization_streams: Dict[str, threading.Event] = {}
+optimization_jobs = OptimizationJobManager(db, max_running_jobs=int(os.environ.get('MAX_OPTIMIZATION_JOBS', 0)) or None)
+optimization_cache = OptimizationResultCache(db, ttl_seconds=int(os.environ.get('OPTIMIZATION_CACHE_TTL_SECONDS', 24 * 3600)))
+panel_store = PanelStore(db)
+sequential_monitor = SequentialMonitor(db)
 
 # Census API configuration
 CENSUS_API_KEY = os.environ.get('CENSUS_API_KEY', '34fbe7e666c730457ba86a6e603feefdeaa32aed')
@@ -247,6 +262,20 @@ async def get_budget_recommendations(
         "rationale": f"Based on industry benchmarks for {objective_type} campaigns and target population"
     }
 
+@app.post("/api/budget/power-solver")
+async def solve_budget_for_power(request: PowerSolverRequest):
+    """
+    Minimum daily budget reaching min_power for each candidate design and duration,
+    solved in one batched call from the designs' historical variance
+    """
+    try:
+        result = await run_in_threadpool(statistical_engine.solve_budget_for_power, request)
+        return result.dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Budget power solver failed: {str(e)}")
+
 # =============================================================================
 # STEP 3: MARKET SELECTION API ENDPOINTS  
 # =============================================================================
@@ -389,30 +418,284 @@ async def analyze_market_similarity(units: List[GeographicUnit]):
 # STEP 4: STATISTICAL ANALYSIS API ENDPOINTS
 # =============================================================================
 
+def _request_panel(request: OptimizationRequest) -> Optional[np.ndarray]:
+    """
+    Pre-period KPI series of the request's design units, when its objective needs them.
+    Also the pre-flight check of every optimize endpoint, so invalid option combinations fail fast.
+    """
+    statistical_engine.validate_request(request)
+    if request.balance_objective != BalanceObjective.PRE_PERIOD_RMSE:
+        return None
+    if not request.panel_id:
+        raise ValueError("panel_id is required for the pre_period_rmse objective")
+    unit_ids = [unit.id for unit in statistical_engine.design_units(request)]
+    return panel_store.unit_series(request.panel_id, request.panel_kpi, unit_ids)
+
+def _request_context(request: OptimizationRequest) -> DesignContext:
+    return statistical_engine.design_context(request, panel=_request_panel(request))
+
 @app.post("/api/analysis/optimize-assignment")
-async def optimize_geo_assignment(request: OptimizationRequest):
-    """Optimize geographic assignment using statistical matching"""
+async def optimize_geo_assignment(request: OptimizationRequest, refresh: bool = Query(False)):
+    """
+    Optimize geographic assignment using statistical matching.
+    Identical requests (same unit metrics and parameters) are served from the
+    result cache; refresh=true bypasses it and stores a fresh result.
+    """
     try:
-        result = statistical_engine.optimize_geo_assignment(request)
+        context = await run_in_threadpool(_request_context, request)
+        panel = context.standardized if request.balance_objective == BalanceObjective.PRE_PERIOD_RMSE else None
+        cache_key = optimization_cache.key(request, context.metrics, panel=panel)
+        if not refresh:
+            cached = optimization_cache.get(cache_key)
+            if cached is not None:
+                return {**cached, "served_from_cache": True}
+        
+        # CPU-bound; run off the event loop so other requests keep being served
+        result = await run_in_threadpool(statistical_engine.optimize_geo_assignment, request, context=context)
+        optimization_cache.put(cache_key, result.dict())
         return result.dict()
+    except ValueError as e:
+        # Infeasible or malformed constraints / design options
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/analysis/optimize-assignment/stream")
+async def stream_optimize_geo_assignment(request: OptimizationRequest, http_request: Request):
+    """
+    Optimize geographic assignment, streaming progress as Server-Sent Events.
+    Emits `started` (with a stream_id), `progress` whenever the best score improves
+    (score, iteration, per-metric balance), then `result` or `error`.
+    POST .../stream/{stream_id}/stop ends the search early and still delivers the
+    best result so far; disconnecting abandons the run.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    
+    # Built once and shared with the engine, so progress balance reports are cheap
+    try:
+        context = await run_in_threadpool(_request_context, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Registered only once the request is valid; event_stream removes it when the run ends
+    stream_id = str(uuid.uuid4())
+    stop = threading.Event()
+    optimization_streams[stream_id] = stop
+    last_reported = {"score": float('inf')}
+    
+    def report(iteration: int, best_score: float, best_assignment) -> bool:
+        if best_score < last_reported["score"]:
+            last_reported["score"] = best_score
+            loop.call_soon_threadsafe(events.put_nowait, ("progress", {
+                "iteration": iteration,
+                "max_iterations": request.max_iterations,
+                "optimization_score": best_score,
+                "balance_metrics": statistical_engine._calculate_balance_metrics(context, best_assignment)
+            }))
+        return stop.is_set()
+    
+    def run():
+        try:
+            result = statistical_engine.optimize_geo_assignment(request, progress_callback=report, context=context)
+            loop.call_soon_threadsafe(events.put_nowait, ("result", result.dict()))
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, ("error", {"detail": f"Optimization failed: {str(e)}"}))
+    
+    async def event_stream():
+        worker = loop.run_in_executor(None, run)
+        try:
+            yield _sse_event("started", {"stream_id": stream_id, "n_units": len(request.available_units)})
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.get(), timeout=5.0)
+                except asyncio.TimeoutError:
+                    if await http_request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse_event(event, data)
+                if event in ("result", "error"):
+                    break
+        finally:
+            # Client gone or run finished: make sure the search stops
+            stop.set()
+            optimization_streams.pop(stream_id, None)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/analysis/optimize-assignment/stream/{stream_id}/stop")
+async def stop_optimization_stream(stream_id: str):
+    """Stop a streaming optimization early; its stream then emits the best result so far"""
+    stop = optimization_streams.get(stream_id)
+    if stop is None:
+        raise HTTPException(status_code=404, detail="Stream not found or already finished")
+    stop.set()
+    return {"stream_id": stream_id, "status": "stopping"}
+
+@app.post("/api/analysis/optimize-assignment/jobs")
+async def submit_optimization_job(request: OptimizationRequest):
+    """Queue an optimization as a background job; poll its status with the returned job id"""
+    try:
+        job_id = optimization_jobs.submit(request, panel=await run_in_threadpool(_request_panel, request))
+        return {"job_id": job_id, "status": "queued"}
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to submit optimization job: {str(e)}")
+
+@app.get("/api/analysis/optimize-assignment/jobs")
+async def list_optimization_jobs(limit: int = Query(default=50)):
+    """List recent optimization jobs"""
+    try:
+        jobs = optimization_jobs.list_jobs(limit)
+        return {"jobs": jobs, "total": len(jobs)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve jobs: {str(e)}")
+
+@app.get("/api/analysis/optimize-assignment/jobs/{job_id}")
+async def get_optimization_job(job_id: str):
+    """Get status, progress and (once finished) the result of an optimization job"""
+    try:
+        job = optimization_jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve job: {str(e)}")
+
+@app.delete("/api/analysis/optimize-assignment/jobs/{job_id}")
+async def cancel_optimization_job(job_id: str):
+    """Cancel a queued or running optimization job"""
+    try:
+        if not optimization_jobs.cancel(job_id):
+            raise HTTPException(status_code=404, detail="Job not found or already finished")
+        return {"job_id": job_id, "status": "cancelling"}
+    except JobNotCancellableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to cancel job: {str(e)}")
+
+@app.post("/api/panels")
+async def upload_kpi_panel(http_request: Request, panel_id: Optional[str] = Query(default=None)):
+    """
+    Upload a daily KPI panel as long-format CSV (unit_id, date, one column per KPI).
+    Re-uploading with an existing panel_id replaces that panel.
+    """
+    try:
+        text = (await http_request.body()).decode("utf-8")
+        panel = await run_in_threadpool(KpiPanel.from_csv, panel_id or str(uuid.uuid4()), text)
+        await run_in_threadpool(panel_store.save, panel)
+        return panel.summary()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Panel upload failed: {str(e)}")
+
+@app.get("/api/panels")
+async def list_kpi_panels():
+    """List stored KPI panels"""
+    try:
+        panels = panel_store.list_panels()
+        return {"panels": panels, "total": len(panels)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve panels: {str(e)}")
+
+@app.get("/api/panels/{panel_id}")
+async def get_kpi_panel(panel_id: str):
+    """Summary of a stored KPI panel"""
+    panel = panel_store.get_summary(panel_id)
+    if not panel:
+        raise HTTPException(status_code=404, detail="Panel not found")
+    return panel
+
+@app.delete("/api/panels/{panel_id}")
+async def delete_kpi_panel(panel_id: str):
+    """Delete a stored KPI panel"""
+    if not panel_store.delete(panel_id):
+        raise HTTPException(status_code=404, detail="Panel not found")
+    return {"panel_id": panel_id, "status": "deleted"}
+
 @app.post("/api/analysis/power-analysis")
 async def calculate_power_analysis(
     treatment_group: TestGroup,
     control_group: TestGroup,
-    expected_effect: float = Body(default=0.1)
+    expected_effect: float = Body(default=0.1),
+    n_bootstrap: Optional[int] = Body(default=None),
+    random_seed: Optional[int] = Body(default=None)
 ):
-    """Calculate statistical power for the test design"""
+    """
+    Calculate statistical power for the test design.
+    With n_bootstrap, bias and coverage come from resampling the design's units.
+    """
     try:
-        metrics = statistical_engine.calculate_statistical_power(
-            treatment_group, control_group, expected_effect
+        metrics = await run_in_threadpool(
+            statistical_engine.calculate_statistical_power,
+            treatment_group, control_group, expected_effect,
+            n_bootstrap=n_bootstrap, random_seed=random_seed
         )
         return metrics.dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Power analysis failed: {str(e)}")
 
+@app.post("/api/analysis/resampling")
+async def resampling_analysis(
+    treatment_group: TestGroup,
+    control_group: TestGroup,
+    n_bootstrap: int = Body(default=1000, ge=2),
+    confidence_level: float = Body(default=0.95, gt=0, lt=1),
+    random_seed: Optional[int] = Body(default=None)
+):
+    """Bootstrap and leave-one-geo-out jackknife bias, variance and CI coverage of the design's lift estimate"""
+    try:
+        result = await run_in_threadpool(
+            statistical_engine.resample_design_metrics,
+            treatment_group, control_group, n_bootstrap, confidence_level, random_seed
+        )
+        return result.dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Resampling analysis failed: {str(e)}")
+
+@app.post("/api/analysis/power-grid")
+async def power_grid_analysis(request: PowerGridRequest):
+    """Power and MDE over the cartesian product of durations, expected lifts and treatment shares"""
+    try:
+        result = statistical_engine.power_grid(request)
+        return result.dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Power grid failed: {str(e)}")
+
+@app.post("/api/analysis/power-simulation")
+async def simulate_power_analysis(request: PowerSimulationRequest):
+    """
+    Simulation-based power analysis: inject lifts into historical geo data,
+    re-estimate them across placebo assignments, report empirical power and MDE
+    """
+    try:
+        result = await run_in_threadpool(statistical_engine.simulate_power, request)
+        return result.dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Power simulation failed: {str(e)}")
+
 @app.post("/api/analysis/quality-validation")
 async def validate_test_quality(
     treatment_group: TestGroup,
@@ -513,6 +796,34 @@ async def update_test_statistical_analysis(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update analysis: {str(e)}")
 
+@app.post("/api/tests/enhanced/{test_id}/reoptimize-assignment")
+async def reoptimize_test_assignment(test_id: str, request: OptimizationRequest):
+    """
+    Re-optimize a stored test's assignment after its unit list changed.
+    The stored treatment/control groups seed the search: kept units start in
+    their previous group, new units are placed greedily, then local refinement runs.
+    """
+    try:
+        test = db.enhanced_lift_tests.find_one({"test_id": test_id}, {"_id": 0})
+        if not test:
+            raise HTTPException(status_code=404, detail="Test not found")
+        
+        if not test.get("treatment_group") or not test.get("control_group"):
+            raise HTTPException(status_code=400, detail="Test has no stored assignment to start from")
+        
+        request.initial_treatment_units = [unit["id"] for unit in test["treatment_group"]["units"]]
+        request.initial_control_units = [unit["id"] for unit in test["control_group"]["units"]]
+        
+        context = await run_in_threadpool(_request_context, request)
+        result = await run_in_threadpool(statistical_engine.optimize_geo_assignment, request, context=context)
+        return result.dict()
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Re-optimization failed: {str(e)}")
+
 @app.put("/api/tests/enhanced/{test_id}/approve")
 async def approve_enhanced_test(test_id: str):
     """Approve enhanced test for launch"""
@@ -574,6 +885,49 @@ async def launch_meta_campaign(test_id: str, campaign_config: dict = Body(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to launch campaign: {str(e)}")
 
+def _require_active_test(test_id: str):
+    test = db.enhanced_lift_tests.find_one({"test_id": test_id}, {"_id": 0, "status": 1})
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    if test["status"] != TestStatus.ACTIVE.value:
+        raise HTTPException(status_code=400, detail="Sequential monitoring is only available for active tests")
+
+@app.post("/api/tests/enhanced/{test_id}/sequential")
+async def start_sequential_monitoring(test_id: str, config: SequentialMonitorConfig = Body(default=SequentialMonitorConfig())):
+    """Start always-valid daily monitoring of an active test (restarts from scratch if already started)"""
+    try:
+        _require_active_test(test_id)
+        return sequential_monitor.start(test_id, config).dict()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start sequential monitoring: {str(e)}")
+
+@app.post("/api/tests/enhanced/{test_id}/sequential/observations")
+async def add_sequential_observations(test_id: str, observations: List[DailyObservation]):
+    """Add new daily treatment/control KPI rows and return the updated always-valid read"""
+    try:
+        _require_active_test(test_id)
+        return sequential_monitor.add_observations(test_id, observations).dict()
+    except HTTPException:
+        raise
+    except SequentialConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to add observations: {str(e)}")
+
+@app.get("/api/tests/enhanced/{test_id}/sequential")
+async def get_sequential_evaluation(test_id: str):
+    """Current always-valid p-value, confidence sequence and decision for a monitored test"""
+    try:
+        return sequential_monitor.evaluate(test_id).dict()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to evaluate test: {str(e)}")
+
 # =============================================================================
 # META CAMPAIGN SELECTION ENDPOINTS
 # =============================================================================
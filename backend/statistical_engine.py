@@ -1,11 +1,322 @@
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Tuple, Any
-from models import GeographicUnit, StatisticalMetrics, QualityIndicators, TestGroup, OptimizationRequest, OptimizationResult
-from scipy.optimize import minimize
+from typing import List, Dict, Tuple, Any, Callable, Optional
+from models import GeographicUnit, StatisticalMetrics, QualityIndicators, TestGroup, OptimizationRequest, OptimizationResult, OptimizationMethod, CoolingSchedule, StratificationKey, BalanceObjective, PowerSimulationRequest, PowerSimulationResult, PowerGridRequest, PowerGridResult, ResamplingResult, PowerSolverRequest, PowerSolverResult, BudgetSolution
+from scipy.optimize import minimize, milp, linear_sum_assignment, LinearConstraint, Bounds
+from scipy.spatial.distance import cdist
+from scipy.linalg import solve_triangular
 from scipy import stats
 import random
+import os
+import time
+import threading
+import tracemalloc
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+METRIC_NAMES = ['population', 'conversions', 'spend', 'revenue', 'conv_rate', 'cpm', 'ctr']
+
+# progress_callback(iteration, best_score, best_assignment) -> True to stop the search early
+ProgressCallback = Callable[[int, float, np.ndarray], bool]
+PROGRESS_INTERVAL = 1000  # local-search iterations between progress reports
+MAX_MASK_BLOCK_BYTES = 64 * 2 ** 20  # cap on the working memory of one random-search block
+PARALLEL_MIN_CELLS = 2_000_000  # draws x units of work below which process-pool helpers stay in-process
+
+DRAWS_PER_CHUNK = 256  # simulations / resamples per seeded task; fixed so results don't depend on n_jobs
+
+_TRACEMALLOC_LOCK = threading.Lock()  # held by the low-memory request that owns tracemalloc
+
+class DesignContext:
+    """
+    Per-request view of a metrics matrix, built once and shared by every
+    optimizer step, balance report and power calculation for that request.
+    Holds the standardized matrix, its column totals and the pooled stds, so
+    scoring an assignment only needs its treatment-group sums.
+    The standardized matrix keeps the dtype of metrics (float32 in low-memory
+    mode); column totals are always accumulated in float64.
+    
+    With the Mahalanobis objective the covariance of the standardized metrics
+    is Cholesky-factored once (C = L L^T) and L^-1 is kept as a whitening
+    matrix, so every candidate score is one (d x d) product, O(d^2), and
+    correlated metrics such as spend, revenue and conversions count once.
+    
+    With the pre-period RMSE objective the balance columns are instead the
+    units' daily KPI series from a panel (n x days), scaled by the average
+    daily level. Group sums are then the groups' aggregated series, kept up
+    to date in O(days) per swap by the same search code, and the score is the
+    RMSE between the treatment and control mean series.
+    n_metrics is the number of balance columns in either case.
+    """
+    
+    def __init__(self, metrics: np.ndarray,
+                 objective: BalanceObjective = BalanceObjective.STANDARDIZED_MEAN_DIFFERENCE,
+                 panel: Optional[np.ndarray] = None):
+        self.metrics = metrics
+        self.n_units = metrics.shape[0]
+        self.raw_totals = metrics.sum(axis=0, dtype=np.float64)
+        
+        column_means = metrics.mean(axis=0, dtype=np.float64)
+        pooled_stds = np.std(metrics, axis=0, dtype=np.float64)
+        # Constant columns rarely give an exact 0 std; treat round-off as constant
+        pooled_stds[pooled_stds <= 1e-12 * np.maximum(np.abs(column_means), 1)] = 1
+        self.pooled_stds = pooled_stds
+        
+        if objective == BalanceObjective.PRE_PERIOD_RMSE:
+            if panel is None or panel.shape[0] != self.n_units:
+                raise ValueError("The pre_period_rmse objective needs a panel series for every unit")
+            level = float(np.abs(panel.mean(axis=0, dtype=np.float64)).mean())
+            self.standardized = panel / (level if level > 0 else 1.0)
+        else:
+            # Centred, so totals - treatment sums never cancels large offsets
+            self.standardized = ((metrics - column_means) / pooled_stds).astype(metrics.dtype, copy=False)
+        self.n_metrics = self.standardized.shape[1]
+        self.totals = self.standardized.sum(axis=0, dtype=np.float64)
+        self._squared = None
+        
+        self.objective = objective
+        self.whitening = None
+        if objective == BalanceObjective.MAHALANOBIS:
+            covariance = np.atleast_2d(np.cov(self.standardized, rowvar=False, bias=True))
+            # Small ridge keeps the factorization defined for constant or collinear metrics
+            covariance += 1e-6 * np.eye(self.n_metrics)
+            cholesky = np.linalg.cholesky(covariance)
+            self.whitening = solve_triangular(cholesky, np.eye(self.n_metrics), lower=True)
+    
+    def balance_distance(self, mean_differences: np.ndarray) -> np.ndarray:
+        """Balance score of standardized mean differences, vectorized over leading axes"""
+        if self.whitening is not None:
+            mean_differences = mean_differences @ self.whitening.T
+        return self._combine(mean_differences)
+    
+    def _combine(self, differences: np.ndarray) -> np.ndarray:
+        """Reduce (whitened) per-column differences to the objective's score"""
+        if self.objective == BalanceObjective.MAHALANOBIS:
+            return np.linalg.norm(differences, axis=-1)
+        if self.objective == BalanceObjective.PRE_PERIOD_RMSE:
+            return np.sqrt(np.mean(differences ** 2, axis=-1))
+        return np.mean(np.abs(differences), axis=-1)
+    
+    def score_from_sums(self, treatment_sums: np.ndarray, n_treatment: int) -> np.ndarray:
+        """
+        Balance score between group means (mean absolute standardized difference,
+        Mahalanobis distance or pre-period RMSE), from standardized treatment sums.
+        Vectorized over leading axes.
+        """
+        n_control = self.n_units - n_treatment
+        treatment_means = treatment_sums / n_treatment
+        control_means = (self.totals - treatment_sums) / n_control
+        return self.balance_distance(treatment_means - control_means)
+    
+    def spread_from_group_sums(self, group_sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """
+        Multi-cell balance score from a (..., k, d) matrix of standardized group
+        sums: the spread (max - min) of the k group means per column, combined as
+        in score_from_sums (means are whitened first under Mahalanobis).
+        Reduces to score_from_sums for k = 2.
+        """
+        group_means = group_sums / counts[:, None]
+        if self.whitening is not None:
+            group_means = group_means @ self.whitening.T
+        return self._combine(group_means.max(axis=-2) - group_means.min(axis=-2))
+    
+    def group_means(self, assignment: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Raw per-metric means of the treatment (1) and control (0) groups"""
+        n_treatment = assignment.sum()
+        treatment_sums = assignment @ self.metrics
+        return (treatment_sums / n_treatment,
+                (self.raw_totals - treatment_sums) / (self.n_units - n_treatment))
+    
+    def group_variances(self, assignment: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Raw per-metric population variances of the treatment and control groups"""
+        if self._squared is None:
+            self._squared = self.metrics ** 2
+        
+        n_treatment = assignment.sum()
+        n_control = self.n_units - n_treatment
+        treatment_means, control_means = self.group_means(assignment)
+        treatment_squares = assignment @ self._squared
+        control_squares = self._squared.sum(axis=0) - treatment_squares
+        return (np.maximum(treatment_squares / n_treatment - treatment_means ** 2, 0),
+                np.maximum(control_squares / n_control - control_means ** 2, 0))
+
+class DesignConstraints:
+    """
+    Feasibility rules from OptimizationRequest.constraints, compiled once per design.
+    
+    Supported keys (others are ignored):
+      must_treat, must_control: unit ids pinned to a group
+      max_treated_population_share, max_treated_spend_share: caps as a share of the total
+      min_treated_per_state, max_treated_per_state: an int for every state, or {state: int}
+      min_units_per_group: smallest allowed group size
+    (exclude is applied before compiling, see StatisticalMatchingEngine.design_units.)
+    
+    Pinned units are boolean masks and per-unit population, spend and state codes
+    are precomputed arrays, so a search keeps running treated totals (reset /
+    apply_swap) and rejects an infeasible swap in O(1) with swap_allowed, while
+    random-search blocks are checked all at once with feasible.
+    """
+    
+    def __init__(self, constraints: Dict[str, Any], units: List[GeographicUnit],
+                 metrics: np.ndarray, n_treatment: int):
+        constraints = constraints or {}
+        n_units = len(units)
+        index = {unit.id: i for i, unit in enumerate(units)}
+        self.n_units = n_units
+        self.n_treatment = n_treatment
+        
+        self.fixed_treatment = self._unit_mask(constraints.get('must_treat'), index, 'must_treat')
+        self.fixed_control = self._unit_mask(constraints.get('must_control'), index, 'must_control')
+        if np.any(self.fixed_treatment & self.fixed_control):
+            raise ValueError("Units cannot be in both must_treat and must_control")
+        self.movable = ~(self.fixed_treatment | self.fixed_control)
+        
+        n_control = n_units - n_treatment
+        min_group = int(constraints.get('min_units_per_group') or 0)
+        if min(n_treatment, n_control) < min_group:
+            raise ValueError(f"Each group needs at least {min_group} units; split is {n_treatment}/{n_control}")
+        if self.fixed_treatment.sum() > n_treatment:
+            raise ValueError(f"must_treat lists more units than the {n_treatment} treatment slots")
+        if self.fixed_control.sum() > n_control:
+            raise ValueError(f"must_control lists more units than the {n_control} control slots")
+        
+        # Columns follow METRIC_NAMES
+        self.population = metrics[:, 0]
+        self.spend = metrics[:, 2]
+        self.max_population = self._share_cap(constraints.get('max_treated_population_share'), self.population)
+        self.max_spend = self._share_cap(constraints.get('max_treated_spend_share'), self.spend)
+        
+        self.states = sorted({unit.state for unit in units if unit.state})
+        codes = {state: code for code, state in enumerate(self.states)}
+        self.state_codes = np.array([codes.get(unit.state, -1) for unit in units], dtype=int)
+        self.min_per_state = self._per_state(constraints.get('min_treated_per_state'), 0)
+        self.max_per_state = self._per_state(constraints.get('max_treated_per_state'), n_units)
+        
+        self.state_indicator = None
+        if np.any(self.min_per_state > 0) or np.any(self.max_per_state < n_units):
+            self.state_indicator = np.zeros((n_units, len(self.states)))
+            stated = np.flatnonzero(self.state_codes >= 0)
+            self.state_indicator[stated, self.state_codes[stated]] = 1
+        
+        self.active = bool(
+            self.fixed_treatment.any() or self.fixed_control.any()
+            or np.isfinite(self.max_population) or np.isfinite(self.max_spend)
+            or self.state_indicator is not None
+        )
+        self.reset(np.zeros(n_units))
+    
+    def _unit_mask(self, ids: Optional[List[str]], index: Dict[str, int], key: str) -> np.ndarray:
+        mask = np.zeros(self.n_units, dtype=bool)
+        unknown = [unit_id for unit_id in ids or [] if unit_id not in index]
+        if unknown:
+            raise ValueError(f"Unknown unit ids in {key}: {unknown[:5]}")
+        mask[[index[unit_id] for unit_id in ids or []]] = True
+        return mask
+    
+    def _share_cap(self, share: Optional[float], values: np.ndarray) -> float:
+        if share is None:
+            return float('inf')
+        if not 0 <= share <= 1:
+            raise ValueError("Treated share caps must be between 0 and 1")
+        return float(share * values.sum())
+    
+    def _per_state(self, limits, default: int) -> np.ndarray:
+        values = np.full(len(self.states), default, dtype=int)
+        if isinstance(limits, dict):
+            unknown = [state for state in limits if state not in self.states]
+            if unknown:
+                raise ValueError(f"Unknown states in per-state limits: {unknown[:5]}")
+            for state, limit in limits.items():
+                values[self.states.index(state)] = int(limit)
+        elif limits is not None:
+            values[:] = int(limits)
+        return values
+    
+    def feasible(self, masks: np.ndarray) -> np.ndarray:
+        """Whether each 0/1 assignment (vectorized over leading axes) meets every constraint"""
+        ok = np.ones(masks.shape[:-1], dtype=bool)
+        if self.fixed_treatment.any():
+            ok &= masks[..., self.fixed_treatment].min(axis=-1) == 1
+        if self.fixed_control.any():
+            ok &= masks[..., self.fixed_control].max(axis=-1) == 0
+        if np.isfinite(self.max_population):
+            ok &= masks @ self.population <= self.max_population
+        if np.isfinite(self.max_spend):
+            ok &= masks @ self.spend <= self.max_spend
+        if self.state_indicator is not None:
+            counts = masks @ self.state_indicator
+            ok &= np.all((counts >= self.min_per_state) & (counts <= self.max_per_state), axis=-1)
+        return ok
+    
+    def reset(self, assignment: np.ndarray):
+        """Recompute the running treated totals for an assignment"""
+        treated = assignment == 1
+        self.treated_population = float(self.population @ treated)
+        self.treated_spend = float(self.spend @ treated)
+        self.state_counts = np.bincount(self.state_codes[treated & (self.state_codes >= 0)],
+                                        minlength=len(self.states))
+    
+    def swap_allowed(self, i: int, k: int) -> bool:
+        """O(1): whether moving treated unit i to control and control unit k to treatment stays feasible"""
+        if self.treated_population - self.population[i] + self.population[k] > self.max_population:
+            return False
+        if self.treated_spend - self.spend[i] + self.spend[k] > self.max_spend:
+            return False
+        state_i, state_k = self.state_codes[i], self.state_codes[k]
+        if state_i != state_k:
+            if state_i >= 0 and self.state_counts[state_i] - 1 < self.min_per_state[state_i]:
+                return False
+            if state_k >= 0 and self.state_counts[state_k] + 1 > self.max_per_state[state_k]:
+                return False
+        return True
+    
+    def apply_swap(self, i: int, k: int):
+        """Update the running totals after an accepted swap"""
+        self.treated_population += self.population[k] - self.population[i]
+        self.treated_spend += self.spend[k] - self.spend[i]
+        if self.state_codes[i] >= 0:
+            self.state_counts[self.state_codes[i]] -= 1
+        if self.state_codes[k] >= 0:
+            self.state_counts[self.state_codes[k]] += 1
+    
+    def feasible_start(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        Greedy feasible assignment: pinned units first, then units that lift
+        states to their minimums, then any unit that keeps every cap satisfied.
+        Units are tried in random order, then smallest capped footprint first.
+        """
+        movable = np.flatnonzero(self.movable)
+        footprint = (self.population / max(self.population.sum(), 1e-12)
+                     + self.spend / max(self.spend.sum(), 1e-12))
+        orders = [rng.permutation(movable), movable[np.argsort(footprint[movable], kind='stable')]]
+        
+        for order in orders:
+            assignment = self.fixed_treatment.astype(float)
+            self.reset(assignment)
+            n_treated = int(assignment.sum())
+            
+            for fill_states_first in (True, False):
+                for i in order:
+                    if n_treated >= self.n_treatment:
+                        break
+                    state = self.state_codes[i]
+                    if assignment[i] == 1 or (fill_states_first and (
+                            state < 0 or self.state_counts[state] >= self.min_per_state[state])):
+                        continue
+                    if (self.treated_population + self.population[i] > self.max_population
+                            or self.treated_spend + self.spend[i] > self.max_spend
+                            or (state >= 0 and self.state_counts[state] >= self.max_per_state[state])):
+                        continue
+                    assignment[i] = 1
+                    self.treated_population += self.population[i]
+                    self.treated_spend += self.spend[i]
+                    if state >= 0:
+                        self.state_counts[state] += 1
+                    n_treated += 1
+            
+            if n_treated == self.n_treatment and self.feasible(assignment):
+                return assignment
+        
+        raise ValueError("Could not construct an assignment satisfying the design constraints")
 
 class StatisticalMatchingEngine:
     """
@@ -18,22 +329,152 @@ class StatisticalMatchingEngine:
         self.min_power = 0.8
         self.significance_level = 0.05
         
-    def optimize_geo_assignment(self, request: OptimizationRequest) -> OptimizationResult:
+    def optimize_geo_assignment(self, request: OptimizationRequest,
+                                progress_callback: Optional[ProgressCallback] = None,
+                                context: Optional[DesignContext] = None) -> OptimizationResult:
         """
         Main optimization function using integer optimization for geo assignment
         Similar to Wayfair's approach
+        
+        progress_callback is invoked periodically by single-chain searches
+        (random, swap, annealing); returning True stops the search early.
+        A DesignContext already built with design_context(request) may be passed in;
+        it is required for the pre_period_rmse objective, which needs the panel.
+        request.constraints are enforced during the search (see DesignConstraints).
+        With request.low_memory the metrics are float32 and peak traced memory is reported.
         """
-        units = request.available_units
+        if not request.low_memory:
+            return self._optimize_geo_assignment(request, progress_callback, context)
+        
+        # tracemalloc is process-wide: one low-memory request owns it at a time,
+        # concurrent ones run untraced and report no peak
+        if not _TRACEMALLOC_LOCK.acquire(blocking=False):
+            return self._optimize_geo_assignment(request, progress_callback, context)
+        started = not tracemalloc.is_tracing()
+        try:
+            if started:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+            result = self._optimize_geo_assignment(request, progress_callback, context)
+            result.peak_memory_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            return result
+        finally:
+            if started:
+                tracemalloc.stop()
+            _TRACEMALLOC_LOCK.release()
+    
+    def validate_request(self, request: OptimizationRequest):
+        """Reject option combinations the optimizer cannot honour, before any work is done"""
+        if request.method == OptimizationMethod.RERANDOMIZATION:
+            # The accepted draws are the randomization distribution used for inference;
+            # chains, strata and cells would each keep only their own best draw
+            if request.n_chains > 1:
+                raise ValueError("Rerandomization draws one acceptance distribution; n_chains must be 1")
+            if request.stratify_by is not None or request.cell_proportions is not None:
+                raise ValueError("Rerandomization cannot be combined with stratify_by or cell_proportions")
+        if request.method == OptimizationMethod.MATCHED_PAIRS:
+            # Chains and strata return assignments only, which would drop the per-pair distances
+            if request.n_chains > 1:
+                raise ValueError("Matched pairs run as a single chain; n_chains must be 1")
+            if request.stratify_by is not None or request.cell_proportions is not None:
+                raise ValueError("Matched pairs cannot be combined with stratify_by or cell_proportions")
+        if request.cell_proportions is not None:
+            # The multi-cell search is its own swap search over one chain and the whole panel
+            if request.method not in (OptimizationMethod.RANDOM_SEARCH, OptimizationMethod.SWAP_SEARCH):
+                raise ValueError(f"Multi-cell designs are only supported for random_search and swap_search, "
+                                 f"not {request.method.value}")
+            if request.n_chains > 1 or request.stratify_by is not None:
+                raise ValueError("Multi-cell designs cannot be combined with n_chains > 1 or stratify_by")
+        if request.initial_treatment_units is not None or request.initial_control_units is not None:
+            if request.initial_treatment_units is None:
+                raise ValueError("A warm start needs initial_treatment_units")
+            if request.method not in (OptimizationMethod.RANDOM_SEARCH, OptimizationMethod.SWAP_SEARCH,
+                                      OptimizationMethod.ANNEALING):
+                raise ValueError(f"Warm starts are only supported for random_search, swap_search and annealing, "
+                                 f"not {request.method.value}")
+            if request.n_chains > 1 or request.stratify_by is not None or request.cell_proportions is not None:
+                raise ValueError("Warm starts cannot be combined with n_chains > 1, stratify_by or cell_proportions")
+    
+    def supports_cancellation(self, request: OptimizationRequest) -> bool:
+        """Whether the search this request dispatches to polls progress_callback and can stop early"""
+        if request.cell_proportions is not None:
+            return True
+        return (request.stratify_by is None and request.n_chains == 1
+                and request.method not in (OptimizationMethod.MILP, OptimizationMethod.MATCHED_PAIRS))
+    
+    def _optimize_geo_assignment(self, request: OptimizationRequest,
+                                 progress_callback: Optional[ProgressCallback] = None,
+                                 context: Optional[DesignContext] = None) -> OptimizationResult:
+        self.validate_request(request)
+        units = self.design_units(request)
         n_units = len(units)
         n_treatment = int(n_units * request.treatment_percentage)
         
         # Extract metrics for optimization
-        metrics_matrix = self._extract_metrics_matrix(units)
+        if context is None:
+            context = self.design_context(request)
+        rng = np.random.default_rng(request.random_seed)
+        
+        design_constraints = DesignConstraints(request.constraints, units, context.metrics, n_treatment)
+        if not design_constraints.active:
+            design_constraints = None
+        elif (request.cell_proportions is not None or request.stratify_by is not None
+              or request.method == OptimizationMethod.MATCHED_PAIRS):
+            raise ValueError("Design constraints are not supported for multi-cell, stratified or matched-pairs designs")
         
         # Run optimization algorithm
-        best_assignment, best_score, iterations = self._integer_optimization(
-            metrics_matrix, n_treatment, request.objectives
-        )
+        milp_objective = None
+        chain_scores = []
+        n_strata = None
+        pairs = []
+        labels = None
+        accepted, accepted_scores, acceptance_rate = [], [], None
+        if request.cell_proportions is not None:
+            labels, best_score, iterations, converged = self._multi_cell_search(
+                context, self._cell_counts(n_units, request.cell_proportions),
+                request.max_iterations, rng, progress_callback=progress_callback
+            )
+            best_assignment = (labels > 0).astype(float)
+        elif request.stratify_by is not None:
+            best_assignment, best_score, iterations, converged, n_strata = self._stratified_optimization(
+                context, units, n_treatment, request, rng
+            )
+        elif request.method == OptimizationMethod.MILP:
+            best_assignment, best_score, iterations, converged, milp_objective = self._milp_optimization(
+                context, n_treatment, request.objectives,
+                request.time_limit_seconds, design_constraints=design_constraints
+            )
+        elif request.method == OptimizationMethod.RERANDOMIZATION:
+            (best_assignment, best_score, iterations, converged,
+             accepted, accepted_scores) = self._rerandomization(
+                context, n_treatment, request.acceptance_threshold, request.n_accepted,
+                request.max_iterations, rng, request.batch_size,
+                progress_callback=progress_callback, design_constraints=design_constraints
+            )
+            acceptance_rate = len(accepted) / iterations if iterations else None
+        elif request.method == OptimizationMethod.MATCHED_PAIRS:
+            best_assignment, best_score, iterations, converged, pairs = self._matched_pairs_optimization(
+                context, n_treatment, request.max_iterations, rng, request.pair_block_size
+            )
+        elif request.n_chains > 1:
+            best_assignment, best_score, iterations, converged, chain_scores = self._multi_start_optimization(
+                context, n_treatment, request, design_constraints=design_constraints
+            )
+        elif request.initial_treatment_units is not None:
+            initial_assignment = self._warm_start_assignment(
+                context, units, n_treatment,
+                request.initial_treatment_units, request.initial_control_units or []
+            )
+            best_assignment, best_score, iterations, converged = self._run_search(
+                context, n_treatment, request, rng, progress_callback=progress_callback,
+                initial_assignment=initial_assignment, design_constraints=design_constraints
+            )
+        else:
+            best_assignment, best_score, iterations, converged = self._run_search(
+                context, n_treatment, request, rng, progress_callback=progress_callback,
+                design_constraints=design_constraints
+            )
         
         # Create groups
         treatment_indices = np.where(best_assignment == 1)[0]
@@ -43,9 +484,20 @@ class StatisticalMatchingEngine:
         control_units = [units[i].id for i in control_indices]
         
         # Calculate balance metrics
-        balance_metrics = self._calculate_balance_metrics(
-            metrics_matrix, best_assignment
-        )
+        if labels is not None:
+            balance_metrics = self._calculate_cell_balance_metrics(context, labels)
+            cell_units = [[units[i].id for i in np.flatnonzero(labels == cell)]
+                          for cell in range(len(request.cell_proportions))]
+        else:
+            balance_metrics = self._calculate_balance_metrics(
+                context, best_assignment
+            )
+            cell_units = []
+        
+        pair_distances = [
+            {"treatment_unit": units[t].id, "control_unit": units[c].id, "distance": distance}
+            for t, c, distance in pairs
+        ]
         
         return OptimizationResult(
             treatment_units=treatment_units,
@@ -53,92 +505,1051 @@ class StatisticalMatchingEngine:
             balance_metrics=balance_metrics,
             optimization_score=best_score,
             iterations=iterations,
-            convergence_achieved=True
+            convergence_achieved=converged,
+            milp_objective=milp_objective,
+            n_chains=max(len(chain_scores), 1),
+            chain_scores=chain_scores,
+            n_strata=n_strata,
+            pair_distances=pair_distances,
+            cell_units=cell_units,
+            acceptance_rate=acceptance_rate,
+            accepted_scores=accepted_scores,
+            accepted_treatment_units=[[units[i].id for i in treated] for treated in accepted]
+        )
+    
+    def design_context(self, request: OptimizationRequest,
+                       panel: Optional[np.ndarray] = None) -> DesignContext:
+        """
+        DesignContext over design_units(request), with the request's dtype and
+        balance objective. panel holds the units' pre-period series, row-aligned
+        with design_units(request), for the pre_period_rmse objective.
+        """
+        metrics = self._extract_metrics_matrix(
+            self.design_units(request), dtype=np.float32 if request.low_memory else np.float64
+        )
+        return DesignContext(metrics, objective=request.balance_objective, panel=panel)
+    
+    def design_units(self, request: OptimizationRequest) -> List[GeographicUnit]:
+        """request.available_units minus any listed in constraints['exclude']"""
+        excluded = set((request.constraints or {}).get('exclude') or [])
+        if not excluded:
+            return request.available_units
+        return [unit for unit in request.available_units if unit.id not in excluded]
+    
+    def _run_search(self, context: DesignContext, n_treatment: int, request: OptimizationRequest,
+                    rng: np.random.Generator,
+                    max_iterations: int = None,
+                    progress_callback: Optional[ProgressCallback] = None,
+                    initial_assignment: Optional[np.ndarray] = None,
+                    design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool]:
+        """
+        Run a single randomized search chain for request.method.
+        With an initial_assignment (warm start), random and swap search are
+        replaced by greedy swap refinement of that assignment, capped at
+        request.warm_start_max_steps; annealing starts from it.
+        """
+        max_iterations = max_iterations or request.max_iterations
+        
+        if initial_assignment is not None and request.method in (OptimizationMethod.RANDOM_SEARCH,
+                                                                 OptimizationMethod.SWAP_SEARCH):
+            return self._warm_start_refinement(
+                context, n_treatment, initial_assignment, rng,
+                max_steps=request.warm_start_max_steps,
+                progress_callback=progress_callback,
+                design_constraints=design_constraints
+            )
+        if request.method == OptimizationMethod.SWAP_SEARCH:
+            return self._swap_local_search(
+                context, n_treatment, request.objectives, max_iterations, rng,
+                progress_callback=progress_callback,
+                initial_assignment=initial_assignment,
+                design_constraints=design_constraints
+            )
+        if request.method == OptimizationMethod.ANNEALING:
+            return self._simulated_annealing(
+                context, n_treatment, request.objectives, max_iterations, rng,
+                schedule=request.cooling_schedule,
+                initial_temperature=request.initial_temperature,
+                cooling_rate=request.cooling_rate,
+                time_limit=request.time_limit_seconds,
+                plateau_iterations=request.plateau_iterations,
+                tolerance=request.convergence_tolerance,
+                progress_callback=progress_callback,
+                initial_assignment=initial_assignment,
+                design_constraints=design_constraints
+            )
+        if request.method == OptimizationMethod.RERANDOMIZATION:
+            return self._rerandomization(
+                context, n_treatment, request.acceptance_threshold, request.n_accepted,
+                max_iterations, rng, request.batch_size,
+                progress_callback=progress_callback, design_constraints=design_constraints
+            )[:4]
+        if request.method == OptimizationMethod.MATCHED_PAIRS:
+            return self._matched_pairs_optimization(
+                context, n_treatment, max_iterations, rng, request.pair_block_size
+            )[:4]
+        return self._integer_optimization(
+            context, n_treatment, request.objectives, max_iterations, rng, request.batch_size,
+            progress_callback=progress_callback, design_constraints=design_constraints
         )
     
-    def _extract_metrics_matrix(self, units: List[GeographicUnit]) -> np.ndarray:
-        """Extract key metrics for optimization"""
-        metrics = []
-        for unit in units:
-            metrics.append([
-                unit.population,
-                unit.historical_conversions,
-                unit.historical_spend,
-                unit.historical_revenue,
-                unit.conversion_rate,
-                unit.cpm,
-                unit.ctr
-            ])
-        return np.array(metrics)
-    
-    def _integer_optimization(self, metrics: np.ndarray, n_treatment: int, 
-                            objectives: List[str]) -> Tuple[np.ndarray, float, int]:
-        """
-        Integer optimization algorithm for balanced assignment
-        """
-        n_units = metrics.shape[0]
-        best_assignment = None
+    def _multi_start_optimization(self, context: DesignContext, n_treatment: int,
+                                  request: OptimizationRequest,
+                                  design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool, List[float]]:
+        """
+        Run n_chains independent search chains across a process pool and keep the best.
+        Random-search draws are sharded across chains; local-search chains are
+        independent restarts. Each chain gets its own seed spawned from random_seed,
+        so results are reproducible for a fixed seed and chain count.
+        """
+        n_chains = request.n_chains
+        seeds = np.random.SeedSequence(request.random_seed).spawn(n_chains)
+        
+        if request.method == OptimizationMethod.RANDOM_SEARCH:
+            chain_iterations = -(-request.max_iterations // n_chains)
+        else:
+            chain_iterations = request.max_iterations
+        
+        # Units are already in the design context; don't pickle them once per chain
+        chain_request = request.copy(update={"available_units": []})
+        tasks = [(context, n_treatment, chain_request, seed, chain_iterations, design_constraints)
+                 for seed in seeds]
+        n_jobs = _pool_size(request.n_jobs, n_chains, n_chains * chain_iterations * context.n_units)
+        results = _map_in_processes(_run_search_chain, tasks, n_jobs)
+        
+        chain_scores = [float(result[1]) for result in results]
+        best_chain = int(np.argmin(chain_scores))
+        best_assignment, best_score, _, converged = results[best_chain]
+        iterations = sum(result[2] for result in results)
+        
+        return best_assignment, best_score, iterations, converged, chain_scores
+    
+    def _stratified_optimization(self, context: DesignContext, units: List[GeographicUnit],
+                                 n_treatment: int,
+                                 request: OptimizationRequest,
+                                 rng: np.random.Generator = None) -> Tuple[np.ndarray, float, int, bool, int]:
+        """
+        Blocked randomization: bucket units into strata, optimize the split
+        independently inside each stratum (across a process pool) and merge.
+        Treatment slots are apportioned by largest remainder so the merged
+        design still has exactly n_treatment treated units.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        strata = self._assign_strata(context, units, request.stratify_by, request.n_strata)
+        sizes = np.array([len(stratum) for stratum in strata])
+        allocation = self._apportion_treatment(sizes, n_treatment, rng)
+        
+        seeds = np.random.SeedSequence(request.random_seed).spawn(len(strata))
+        stratum_request = request.copy(update={"available_units": []})
+        pre_period = request.balance_objective == BalanceObjective.PRE_PERIOD_RMSE
+        tasks = [
+            (context.metrics[stratum], int(n_stratum_treatment), stratum_request, seed,
+             context.standardized[stratum] if pre_period else None)
+            for stratum, n_stratum_treatment, seed in zip(strata, allocation, seeds)
+        ]
+        n_jobs = _pool_size(request.n_jobs, len(strata), request.max_iterations * context.n_units)
+        results = _map_in_processes(_run_stratum, tasks, n_jobs)
+        
+        assignment = np.zeros(context.n_units)
+        iterations = 0
+        converged = True
+        for stratum, (stratum_assignment, stratum_iterations, stratum_converged) in zip(strata, results):
+            assignment[stratum] = stratum_assignment
+            iterations += stratum_iterations
+            converged = converged and stratum_converged
+        
+        return assignment, self._calculate_balance_score(context, assignment), iterations, converged, len(strata)
+    
+    def _apportion_treatment(self, sizes: np.ndarray, n_treatment: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        Largest-remainder split of n_treatment slots over strata of the given sizes.
+        Equal-size strata tie on their remainders, and quantile strata are
+        ordered by the stratifying metric, so handing tied extra slots to the
+        first strata would tilt treatment toward the low buckets. Tied slots are
+        instead spread evenly over the tied strata from a random offset
+        (systematic sampling), so any residual tilt changes sign with the seed.
+        """
+        quotas = sizes * n_treatment / sizes.sum()
+        allocation = np.floor(quotas).astype(int)
+        remainder = int(n_treatment - allocation.sum())
+        if remainder <= 0:
+            return allocation
+        
+        remainders = quotas - allocation
+        cutoff = np.sort(remainders)[::-1][remainder - 1]
+        tolerance = 1e-9
+        allocation[remainders > cutoff + tolerance] += 1
+        tied = np.flatnonzero(np.abs(remainders - cutoff) <= tolerance)
+        needed = remainder - int(np.sum(remainders > cutoff + tolerance))
+        positions = ((np.arange(needed) + rng.random()) * len(tied) / needed).astype(int)
+        allocation[tied[positions]] += 1
+        return allocation
+    
+    def _assign_strata(self, context: DesignContext, units: List[GeographicUnit],
+                       stratify_by: StratificationKey, n_strata: int) -> List[np.ndarray]:
+        """Row indices of each stratum: equal-size quantile buckets of a metric, or groups of state/DMA"""
+        if stratify_by in (StratificationKey.STATE, StratificationKey.DMA):
+            groups = defaultdict(list)
+            for i, unit in enumerate(units):
+                groups[getattr(unit, stratify_by.value) or 'unknown'].append(i)
+            return [np.array(indices) for _, indices in sorted(groups.items())]
+        
+        column = METRIC_NAMES.index(stratify_by.value)
+        n_strata = max(1, min(n_strata, context.n_units))
+        order = np.argsort(context.metrics[:, column], kind='stable')
+        buckets = np.empty(context.n_units, dtype=int)
+        buckets[order] = np.arange(context.n_units) * n_strata // context.n_units
+        return [np.flatnonzero(buckets == bucket) for bucket in range(n_strata)]
+    
+    def _warm_start_assignment(self, context: DesignContext, units: List[GeographicUnit],
+                               n_treatment: int, treatment_ids: List[str],
+                               control_ids: List[str]) -> np.ndarray:
+        """
+        Seed an assignment from an existing design after units were added or removed.
+        Units keep their previous group; new units are placed greedily in
+        whichever group leaves the means closer; then treated units are moved
+        one at a time (best balance first) until exactly n_treatment are treated.
+        """
+        standardized = context.standardized
+        previous_treatment = set(treatment_ids)
+        previous_control = set(control_ids)
+        
+        assignment = np.full(context.n_units, -1.0)
+        for i, unit in enumerate(units):
+            if unit.id in previous_treatment:
+                assignment[i] = 1
+            elif unit.id in previous_control:
+                assignment[i] = 0
+        
+        treatment_sums = (assignment == 1) @ standardized
+        control_sums = (assignment == 0) @ standardized
+        n_treated = int(np.sum(assignment == 1))
+        n_control = int(np.sum(assignment == 0))
+        
+        # Place new units, keeping the treated count on track where possible
+        new_units = np.flatnonzero(assignment == -1)
+        for position, i in enumerate(new_units):
+            remaining = len(new_units) - position
+            need = n_treatment - n_treated
+            z = standardized[i]
+            
+            if need <= 0:
+                to_treatment = False
+            elif need >= remaining or n_treated == 0:
+                to_treatment = True
+            elif n_control == 0:
+                to_treatment = False
+            else:
+                treat_diff = np.mean(np.abs((treatment_sums + z) / (n_treated + 1) - control_sums / n_control))
+                control_diff = np.mean(np.abs(treatment_sums / n_treated - (control_sums + z) / (n_control + 1)))
+                to_treatment = treat_diff < control_diff
+            
+            if to_treatment:
+                assignment[i] = 1
+                treatment_sums = treatment_sums + z
+                n_treated += 1
+            else:
+                assignment[i] = 0
+                control_sums = control_sums + z
+                n_control += 1
+        
+        # Repair the treated count by moving the units that best preserve balance
+        while n_treated > n_treatment:
+            candidates = np.flatnonzero(assignment == 1)
+            scores = context.score_from_sums(treatment_sums - standardized[candidates], n_treated - 1)
+            move = candidates[int(np.argmin(scores))]
+            assignment[move] = 0
+            treatment_sums = treatment_sums - standardized[move]
+            n_treated -= 1
+        
+        while n_treated < n_treatment:
+            candidates = np.flatnonzero(assignment == 0)
+            scores = context.score_from_sums(treatment_sums + standardized[candidates], n_treated + 1)
+            move = candidates[int(np.argmin(scores))]
+            assignment[move] = 1
+            treatment_sums = treatment_sums + standardized[move]
+            n_treated += 1
+        
+        return assignment
+    
+    def _extract_metrics_matrix(self, units: List[GeographicUnit], dtype=np.float64) -> np.ndarray:
+        """
+        Extract key metrics for optimization.
+        Rows are streamed into one preallocated contiguous (n x 7) array of the
+        given dtype, without an intermediate list of Python floats.
+        """
+        rows = (
+            (unit.population,
+             unit.historical_conversions,
+             unit.historical_spend,
+             unit.historical_revenue,
+             unit.conversion_rate,
+             unit.cpm,
+             unit.ctr)
+            for unit in units
+        )
+        return np.fromiter(rows, dtype=(dtype, len(METRIC_NAMES)), count=len(units))
+    
+    def _integer_optimization(self, context: DesignContext, n_treatment: int, 
+                            objectives: List[str], max_iterations: int = 10000,
+                            rng: np.random.Generator = None,
+                            batch_size: int = 256,
+                            progress_callback: Optional[ProgressCallback] = None,
+                            design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool]:
+        """
+        Integer optimization algorithm for balanced assignment.
+        Random candidate assignments are drawn and scored in blocks of
+        batch_size, so each NumPy call evaluates a whole block at once.
+        With design constraints, pinned units are fixed in every draw and
+        infeasible candidates in a block are scored as inf.
+        Converged means the 0.01 early-stop threshold was reached.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        n_units = context.n_units
+        best_assignment = np.zeros(n_units)
         best_score = float('inf')
-        max_iterations = 10000
+        
+        if n_treatment == 0 or n_treatment == n_units:
+            return best_assignment, best_score, 0, False
+        
+        # Keep each block (random keys, partition indices and masks) within the memory budget
+        itemsize = context.standardized.dtype.itemsize
+        batch_size = max(1, min(batch_size, MAX_MASK_BLOCK_BYTES // (n_units * (2 * itemsize + 8))))
+        iterations = 0
         
         # Multiple random starts for global optimization
+        while iterations < max_iterations:
+            n_candidates = min(batch_size, max_iterations - iterations)
+            
+            # Generate a block of random assignments
+            masks = self._random_assignment_masks(n_units, n_treatment, n_candidates, rng, design_constraints,
+                                                  dtype=context.standardized.dtype)
+            
+            # Calculate balance scores for the whole block
+            scores = context.score_from_sums(masks @ context.standardized, n_treatment)
+            if design_constraints is not None:
+                scores[~design_constraints.feasible(masks)] = np.inf
+            
+            # Early stopping if very good balance achieved
+            hits = np.flatnonzero(scores < 0.01)
+            if hits.size:
+                n_candidates = hits[0] + 1
+                scores = scores[:n_candidates]
+            iterations += n_candidates
+            
+            # Update best if better
+            block_best = int(np.argmin(scores))
+            if scores[block_best] < best_score:
+                best_score = float(scores[block_best])
+                best_assignment = masks[block_best].copy()
+            
+            if hits.size:
+                break
+            
+            if progress_callback is not None and progress_callback(iterations, best_score, best_assignment):
+                break
+        
+        if design_constraints is not None and not np.isfinite(best_score):
+            # No random draw was feasible; fall back to a constructed design
+            best_assignment = design_constraints.feasible_start(rng)
+            best_score = self._calculate_balance_score(context, best_assignment)
+        
+        return best_assignment, best_score, iterations, best_score < 0.01
+    
+    def _rerandomization(self, context: DesignContext, n_treatment: int,
+                         threshold: Optional[float], n_accepted: int = 1,
+                         max_iterations: int = 10000,
+                         rng: np.random.Generator = None,
+                         batch_size: int = 256,
+                         progress_callback: Optional[ProgressCallback] = None,
+                         design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool, List[np.ndarray], List[float]]:
+        """
+        Morgan-Rubin rerandomization: draw random assignments in vectorized
+        blocks and accept those whose balance score is below threshold, stopping
+        as soon as n_accepted draws are accepted (or max_iterations draws are spent).
+        The first accepted draw is the design; all accepted draws (treated row
+        indices) and their scores form the randomization distribution for inference.
+        Returns (assignment, score, draws, converged, accepted, accepted_scores);
+        without any acceptance the best draw is returned and converged is False.
+        """
+        if threshold is None:
+            raise ValueError("acceptance_threshold is required for rerandomization")
+        
+        rng = rng if rng is not None else np.random.default_rng()
+        n_units = context.n_units
+        n_accepted = max(1, n_accepted)
+        best_assignment = np.zeros(n_units)
+        best_score = float('inf')
+        accepted, accepted_scores = [], []
+        
+        if n_treatment == 0 or n_treatment == n_units:
+            return best_assignment, best_score, 0, False, accepted, accepted_scores
+        
+        itemsize = context.standardized.dtype.itemsize
+        batch_size = max(1, min(batch_size, MAX_MASK_BLOCK_BYTES // (n_units * (2 * itemsize + 8))))
+        draws = 0
+        
+        while draws < max_iterations and len(accepted) < n_accepted:
+            n_candidates = min(batch_size, max_iterations - draws)
+            masks = self._random_assignment_masks(n_units, n_treatment, n_candidates, rng, design_constraints,
+                                                  dtype=context.standardized.dtype)
+            scores = context.score_from_sums(masks @ context.standardized, n_treatment)
+            if design_constraints is not None:
+                scores[~design_constraints.feasible(masks)] = np.inf
+            
+            # Stop counting draws at the acceptance that completes the sample
+            hits = np.flatnonzero(scores < threshold)[:n_accepted - len(accepted)]
+            if len(accepted) + hits.size == n_accepted:
+                n_candidates = hits[-1] + 1
+            draws += n_candidates
+            
+            # Until something is accepted, keep the best draw as a fallback
+            block_best = int(np.argmin(scores[:n_candidates]))
+            if not accepted and scores[block_best] < best_score:
+                best_score = float(scores[block_best])
+                best_assignment = masks[block_best].copy()
+            
+            for hit in hits:
+                if not accepted:
+                    best_score = float(scores[hit])
+                    best_assignment = masks[hit].copy()
+                accepted.append(np.flatnonzero(masks[hit]))
+                accepted_scores.append(float(scores[hit]))
+            
+            if progress_callback is not None and progress_callback(draws, best_score, best_assignment):
+                break
+        
+        return best_assignment, best_score, draws, len(accepted) >= n_accepted, accepted, accepted_scores
+    
+    def _random_assignment_masks(self, n_units: int, n_treatment: int, n_candidates: int,
+                                 rng: np.random.Generator,
+                                 design_constraints: Optional[DesignConstraints] = None,
+                                 dtype=np.float64) -> np.ndarray:
+        """
+        Draw a (n_candidates x n_units) block of random 0/1 assignments with n_treatment ones per row.
+        Units pinned by design_constraints keep their group; the rest are drawn.
+        """
+        if design_constraints is None:
+            keys = rng.random((n_candidates, n_units), dtype=dtype)
+            treatment_indices = np.argpartition(keys, n_treatment - 1, axis=1)[:, :n_treatment]
+            masks = np.zeros((n_candidates, n_units), dtype=dtype)
+            np.put_along_axis(masks, treatment_indices, 1, axis=1)
+            return masks
+        
+        movable = np.flatnonzero(design_constraints.movable)
+        masks = np.zeros((n_candidates, n_units), dtype=dtype)
+        masks[:, design_constraints.fixed_treatment] = 1
+        n_draw = n_treatment - int(design_constraints.fixed_treatment.sum())
+        if n_draw > 0:
+            keys = rng.random((n_candidates, len(movable)), dtype=dtype)
+            drawn = np.argpartition(keys, n_draw - 1, axis=1)[:, :n_draw]
+            np.put_along_axis(masks, movable[drawn], 1, axis=1)
+        return masks
+    
+    def _swap_local_search(self, context: DesignContext, n_treatment: int,
+                           objectives: List[str], max_iterations: int = 10000,
+                           rng: np.random.Generator = None,
+                           progress_callback: Optional[ProgressCallback] = None,
+                           initial_assignment: Optional[np.ndarray] = None,
+                           design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool]:
+        """
+        Swap-neighbourhood local search for balanced assignment.
+        Each step proposes exchanging one treatment unit with one control unit;
+        group metric sums are updated in O(d) instead of rescoring the whole matrix.
+        Starts from initial_assignment when given, otherwise from a random split.
+        With design constraints, pinned units never move and infeasible swaps
+        are rejected in O(1) from running totals before scoring.
+        Converged means a local optimum was reached before max_iterations.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        n_units = context.n_units
+        n_control = n_units - n_treatment
+        
+        if n_treatment == 0 or n_control == 0:
+            return np.zeros(n_units), float('inf'), 0, False
+        
+        standardized = context.standardized
+        
+        # Starting split
+        assignment = self._starting_assignment(n_units, n_treatment, rng, initial_assignment, design_constraints)
+        treated, control, fixed_treatment = self._swap_pools(assignment, design_constraints)
+        treatment_sums = assignment @ standardized
+        score = context.score_from_sums(treatment_sums, n_treatment)
+        if len(treated) == 0 or len(control) == 0:
+            return assignment, float(score), 0, True
+        
+        # Stop once no proposal has improved the score for a couple of sweeps of the units
+        patience = max(2 * n_units, 1000)
+        stale = 0
+        converged = False
+        treated_draws = rng.integers(len(treated), size=max_iterations)
+        control_draws = rng.integers(len(control), size=max_iterations)
+        
+        iteration = 0
+        for iteration in range(max_iterations):
+            t_pos = treated_draws[iteration]
+            c_pos = control_draws[iteration]
+            i, k = treated[t_pos], control[c_pos]
+            
+            if design_constraints is not None and not design_constraints.swap_allowed(i, k):
+                candidate_score = np.inf
+            else:
+                candidate_sums = treatment_sums + standardized[k] - standardized[i]
+                candidate_score = context.score_from_sums(candidate_sums, n_treatment)
+            
+            if candidate_score < score:
+                treated[t_pos], control[c_pos] = k, i
+                treatment_sums = candidate_sums
+                score = candidate_score
+                stale = 0
+                if design_constraints is not None:
+                    design_constraints.apply_swap(i, k)
+            else:
+                stale += 1
+                if stale >= patience:
+                    converged = True
+                    break
+            
+            if (progress_callback is not None and (iteration + 1) % PROGRESS_INTERVAL == 0
+                    and progress_callback(iteration + 1, float(score),
+                                          self._assignment_from_treated(n_units, treated, fixed_treatment))):
+                break
+        
+        assignment = self._assignment_from_treated(n_units, treated, fixed_treatment)
+        
+        # Rescore from scratch to drop accumulated floating point drift
+        return assignment, self._calculate_balance_score(context, assignment), iteration + 1, converged
+    
+    def _warm_start_refinement(self, context: DesignContext, n_treatment: int,
+                               initial_assignment: np.ndarray,
+                               rng: np.random.Generator = None,
+                               max_steps: int = 1000,
+                               progress_callback: Optional[ProgressCallback] = None,
+                               design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool]:
+        """
+        Greedy swap descent from a warm start, for small edits to an existing design.
+        Each step is two vectorized O(n d) passes: the treated unit whose move to
+        control helps most is paired with the control unit that then helps most
+        (and the mirror order, control first); the better pair is swapped if it
+        improves the score. Every step improves, so the search stops at a local
+        optimum of this neighbourhood, typically within a few steps of a
+        repaired design, or after max_steps.
+        Converged means the local optimum was reached.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        n_units = context.n_units
+        if n_treatment == 0 or n_treatment == n_units:
+            return np.zeros(n_units), float('inf'), 0, False
+        
+        standardized = context.standardized
+        assignment = self._starting_assignment(n_units, n_treatment, rng, initial_assignment, design_constraints)
+        treated, control, fixed_treatment = self._swap_pools(assignment, design_constraints)
+        treatment_sums = assignment @ standardized
+        score = float(context.score_from_sums(treatment_sums, n_treatment))
+        if len(treated) == 0 or len(control) == 0:
+            return assignment, score, 0, True
+        
+        def best_partner(base_sums: np.ndarray, candidates: np.ndarray, paired: int, treated_first: bool):
+            """Best allowed (position, score) among candidates completing a swap with `paired`"""
+            scores = context.score_from_sums(base_sums + (1 if treated_first else -1) * standardized[candidates],
+                                             n_treatment)
+            for position in np.argsort(scores, kind='stable'):
+                i, k = (paired, candidates[position]) if treated_first else (candidates[position], paired)
+                if design_constraints is None or design_constraints.swap_allowed(i, k):
+                    return int(position), float(scores[position])
+            return None, np.inf
+        
+        converged = False
+        step = 0
+        for step in range(max_steps):
+            # Treated unit first, then its best control partner
+            t_pos = int(np.argmin(context.score_from_sums(treatment_sums - standardized[treated], n_treatment - 1)))
+            c_pos, forward_score = best_partner(treatment_sums - standardized[treated[t_pos]], control,
+                                                treated[t_pos], treated_first=True)
+            # Control unit first, then its best treated partner
+            c_first = int(np.argmin(context.score_from_sums(treatment_sums + standardized[control], n_treatment + 1)))
+            t_second, backward_score = best_partner(treatment_sums + standardized[control[c_first]], treated,
+                                                    control[c_first], treated_first=False)
+            if backward_score < forward_score:
+                t_pos, c_pos, forward_score = t_second, c_first, backward_score
+            
+            if c_pos is None or forward_score >= score:
+                converged = True
+                break
+            
+            i, k = treated[t_pos], control[c_pos]
+            treated[t_pos], control[c_pos] = k, i
+            treatment_sums = treatment_sums + standardized[k] - standardized[i]
+            score = forward_score
+            if design_constraints is not None:
+                design_constraints.apply_swap(i, k)
+            
+            if (progress_callback is not None and (step + 1) % PROGRESS_INTERVAL == 0
+                    and progress_callback(step + 1, score, self._assignment_from_treated(n_units, treated, fixed_treatment))):
+                break
+        
+        assignment = self._assignment_from_treated(n_units, treated, fixed_treatment)
+        return assignment, self._calculate_balance_score(context, assignment), step + 1, converged
+    
+    def _simulated_annealing(self, context: DesignContext, n_treatment: int,
+                             objectives: List[str], max_iterations: int = 10000,
+                             rng: np.random.Generator = None,
+                             schedule: CoolingSchedule = CoolingSchedule.GEOMETRIC,
+                             initial_temperature: float = None,
+                             cooling_rate: float = 0.999,
+                             time_limit: float = None,
+                             plateau_iterations: int = 2000,
+                             tolerance: float = 1e-4,
+                             progress_callback: Optional[ProgressCallback] = None,
+                             initial_assignment: Optional[np.ndarray] = None,
+                             design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool]:
+        """
+        Simulated annealing over the swap neighbourhood.
+        Uphill swaps are accepted with probability exp(-delta / T) while T cools
+        according to the schedule. The run converges once the best score has not
+        improved by more than `tolerance` (relative) for plateau_iterations steps;
+        otherwise it stops at max_iterations or time_limit and reports no convergence.
+        Starts from initial_assignment when given, otherwise from a random split.
+        Design constraints are enforced as in _swap_local_search.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        n_units = context.n_units
+        n_control = n_units - n_treatment
+        
+        if n_treatment == 0 or n_control == 0:
+            return np.zeros(n_units), float('inf'), 0, False
+        
+        standardized = context.standardized
+        
+        assignment = self._starting_assignment(n_units, n_treatment, rng, initial_assignment, design_constraints)
+        treated, control, fixed_treatment = self._swap_pools(assignment, design_constraints)
+        treatment_sums = assignment @ standardized
+        score = context.score_from_sums(treatment_sums, n_treatment)
+        if len(treated) == 0 or len(control) == 0:
+            return assignment, float(score), 0, True
+        
+        best_score = score
+        best_treated = treated.copy()
+        
+        if initial_temperature is None:
+            initial_temperature = self._initial_temperature(
+                context, n_treatment, treated, control, treatment_sums, score, rng
+            )
+        
+        start_time = time.perf_counter()
+        last_improvement = 0
+        converged = False
+        block = 4096
+        
+        iteration = 0
         for iteration in range(max_iterations):
-            # Generate random assignment
+            if iteration % block == 0:
+                treated_draws = rng.integers(len(treated), size=block)
+                control_draws = rng.integers(len(control), size=block)
+                uniforms = rng.random(block)
+                if time_limit is not None and time.perf_counter() - start_time > time_limit:
+                    break
+            
+            step = iteration % block
+            t_pos = treated_draws[step]
+            c_pos = control_draws[step]
+            i, k = treated[t_pos], control[c_pos]
+            
+            if design_constraints is not None and not design_constraints.swap_allowed(i, k):
+                candidate_score = np.inf
+            else:
+                candidate_sums = treatment_sums + standardized[k] - standardized[i]
+                candidate_score = context.score_from_sums(candidate_sums, n_treatment)
+            delta = candidate_score - score
+            
+            temperature = self._temperature(schedule, initial_temperature, cooling_rate,
+                                            iteration, max_iterations)
+            # exp(-delta / T) underflows to zero past delta > 700 T; skip it there
+            if delta < 0 or (delta < 700 * temperature and uniforms[step] < np.exp(-delta / temperature)):
+                treated[t_pos], control[c_pos] = k, i
+                treatment_sums = candidate_sums
+                score = candidate_score
+                if design_constraints is not None:
+                    design_constraints.apply_swap(i, k)
+                
+                if score < best_score:
+                    if score < best_score * (1 - tolerance):
+                        last_improvement = iteration
+                    best_score = score
+                    best_treated = treated.copy()
+            
+            # Plateau detection
+            if iteration - last_improvement >= plateau_iterations:
+                converged = True
+                break
+            
+            if (progress_callback is not None and (iteration + 1) % PROGRESS_INTERVAL == 0
+                    and progress_callback(iteration + 1, float(best_score),
+                                          self._assignment_from_treated(n_units, best_treated, fixed_treatment))):
+                break
+        
+        assignment = self._assignment_from_treated(n_units, best_treated, fixed_treatment)
+        
+        return assignment, self._calculate_balance_score(context, assignment), iteration + 1, converged
+    
+    def _starting_assignment(self, n_units: int, n_treatment: int, rng: np.random.Generator,
+                             initial_assignment: Optional[np.ndarray] = None,
+                             design_constraints: Optional[DesignConstraints] = None) -> np.ndarray:
+        """
+        Local-search starting split: the warm start if it is feasible, else a
+        constructed feasible design under constraints, else a random split.
+        """
+        if initial_assignment is not None and (
+                design_constraints is None or design_constraints.feasible(initial_assignment)):
+            assignment = initial_assignment.copy()
+        elif design_constraints is not None:
+            assignment = design_constraints.feasible_start(rng)
+        else:
             assignment = np.zeros(n_units)
-            treatment_indices = np.random.choice(n_units, n_treatment, replace=False)
-            assignment[treatment_indices] = 1
+            assignment[rng.choice(n_units, n_treatment, replace=False)] = 1
+        
+        if design_constraints is not None:
+            design_constraints.reset(assignment)
+        return assignment
+    
+    def _swap_pools(self, assignment: np.ndarray,
+                    design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """Treated and control indices that swaps may move, and the pinned-treatment mask"""
+        if design_constraints is None:
+            return np.flatnonzero(assignment == 1), np.flatnonzero(assignment == 0), None
+        movable = design_constraints.movable
+        return (np.flatnonzero((assignment == 1) & movable), np.flatnonzero((assignment == 0) & movable),
+                design_constraints.fixed_treatment)
+    
+    def _assignment_from_treated(self, n_units: int, treated: np.ndarray,
+                                 fixed_treatment: Optional[np.ndarray] = None) -> np.ndarray:
+        """0/1 assignment vector from treated row indices, plus any pinned treatment units"""
+        assignment = np.zeros(n_units) if fixed_treatment is None else fixed_treatment.astype(float)
+        assignment[treated] = 1
+        return assignment
+    
+    def _initial_temperature(self, context: DesignContext, n_treatment: int,
+                             treated: np.ndarray, control: np.ndarray,
+                             treatment_sums: np.ndarray, score: float,
+                             rng: np.random.Generator, n_samples: int = 200,
+                             acceptance: float = 0.8) -> float:
+        """Temperature at which a typical uphill swap is accepted with the given probability"""
+        i = treated[rng.integers(len(treated), size=n_samples)]
+        k = control[rng.integers(len(control), size=n_samples)]
+        candidate_sums = treatment_sums + context.standardized[k] - context.standardized[i]
+        deltas = context.score_from_sums(candidate_sums, n_treatment) - score
+        uphill = deltas[deltas > 0]
+        
+        if uphill.size == 0:
+            return 1e-6
+        return float(-np.mean(uphill) / np.log(acceptance))
+    
+    def _temperature(self, schedule: CoolingSchedule, initial_temperature: float,
+                     cooling_rate: float, iteration: int, max_iterations: int) -> float:
+        """Annealing temperature at the given iteration"""
+        if schedule == CoolingSchedule.LINEAR:
+            return initial_temperature * max(0.0, 1 - iteration / max_iterations)
+        if schedule == CoolingSchedule.LOGARITHMIC:
+            return initial_temperature / np.log(np.e + iteration)
+        return initial_temperature * cooling_rate ** iteration
+    
+    def _matched_pairs_optimization(self, context: DesignContext, n_treatment: int,
+                                    max_iterations: int = 10000,
+                                    rng: np.random.Generator = None,
+                                    block_size: int = 500) -> Tuple[np.ndarray, float, int, bool, List[Tuple[int, int, float]]]:
+        """
+        Matched-pairs design: every treated unit gets its nearest control twin.
+        Units are ordered along the first principal component of the standardized
+        metrics and cut into blocks; inside each block alternate units form the
+        two sides of a bipartite matching solved with linear_sum_assignment.
+        For unequal splits min(n_treatment, n_control) evenly spaced pairs are kept.
+        Pair orientations are then flipped greedily to balance the overall group means.
+        Returns (assignment, score, flip rounds, converged, [(treated, control, distance)]).
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        n_units = context.n_units
+        n_control = n_units - n_treatment
+        standardized = context.standardized
+        
+        if n_treatment == 0 or n_control == 0:
+            return np.full(n_units, 1.0 if n_treatment else 0.0), float('inf'), 0, False, []
+        
+        # Order units so that similar units are adjacent
+        centered = standardized - standardized.mean(axis=0)
+        _, _, components = np.linalg.svd(centered, full_matrices=False)
+        order = np.argsort(centered @ components[0], kind='stable')
+        
+        # Bipartite matching inside each block
+        block_size = max(2, block_size - block_size % 2)
+        firsts, seconds, distances = [], [], []
+        for start in range(0, n_units, block_size):
+            block = order[start:start + block_size]
+            left, right = block[0::2], block[1::2][:len(block) // 2]
+            if len(right) == 0:
+                continue
+            cost = cdist(standardized[left], standardized[right])
+            rows, cols = linear_sum_assignment(cost)
+            firsts.append(left[rows])
+            seconds.append(right[cols])
+            distances.append(cost[rows, cols])
+        
+        firsts = np.concatenate(firsts)
+        seconds = np.concatenate(seconds)
+        distances = np.concatenate(distances)
+        
+        # Unequal splits keep an evenly spaced subset of pairs along the ordering,
+        # so both groups still span the metric range; unpaired units join the larger group
+        n_pairs = min(n_treatment, n_control)
+        keep = np.arange(n_pairs) * len(firsts) // n_pairs
+        firsts, seconds, distances = firsts[keep], seconds[keep], distances[keep]
+        
+        assignment = np.full(n_units, 1.0 if n_treatment > n_control else 0.0)
+        
+        # Random orientation, then greedy pair flips on the balance score
+        orientation = rng.random(n_pairs) < 0.5
+        treated = np.where(orientation, firsts, seconds)
+        untreated = np.where(orientation, seconds, firsts)
+        assignment[treated] = 1
+        assignment[untreated] = 0
+        
+        treatment_sums = assignment @ standardized
+        score = context.score_from_sums(treatment_sums, n_treatment)
+        flip_deltas = standardized[untreated] - standardized[treated]
+        
+        converged = False
+        rounds = 0
+        for rounds in range(1, max_iterations + 1):
+            candidate_scores = context.score_from_sums(treatment_sums + flip_deltas, n_treatment)
+            best_flip = int(np.argmin(candidate_scores))
+            if candidate_scores[best_flip] >= score:
+                converged = True
+                break
             
-            # Calculate balance score
-            score = self._calculate_balance_score(metrics, assignment)
+            treatment_sums = treatment_sums + flip_deltas[best_flip]
+            score = candidate_scores[best_flip]
+            treated[best_flip], untreated[best_flip] = untreated[best_flip], treated[best_flip]
+            flip_deltas[best_flip] = -flip_deltas[best_flip]
+        
+        assignment[treated] = 1
+        assignment[untreated] = 0
+        pairs = [(int(t), int(c), float(d)) for t, c, d in zip(treated, untreated, distances)]
+        
+        return assignment, self._calculate_balance_score(context, assignment), rounds, converged, pairs
+    
+    def _cell_counts(self, n_units: int, proportions: List[float]) -> np.ndarray:
+        """Units per cell for the given proportions (normalized), by largest remainder"""
+        proportions = np.asarray(proportions, dtype=float)
+        if len(proportions) < 2 or np.any(proportions <= 0):
+            raise ValueError("cell_proportions needs at least two positive entries")
+        
+        quotas = proportions / proportions.sum() * n_units
+        counts = np.floor(quotas).astype(int)
+        remainder = n_units - counts.sum()
+        counts[np.argsort(-(quotas - counts), kind='stable')[:remainder]] += 1
+        if np.any(counts == 0):
+            raise ValueError("Not enough units to give every cell at least one unit")
+        return counts
+    
+    def _multi_cell_search(self, context: DesignContext, counts: np.ndarray,
+                           max_iterations: int = 10000,
+                           rng: np.random.Generator = None,
+                           progress_callback: Optional[ProgressCallback] = None) -> Tuple[np.ndarray, float, int, bool]:
+        """
+        Swap-neighbourhood search over k cells (cell 0 is the holdout).
+        Keeps a (k x d) matrix of standardized group sums; each step swaps two
+        units between two random cells, updating two rows in O(d) and rescoring
+        all cells at once in O(k d) via DesignContext.spread_from_group_sums.
+        The reported max - min spread is flat under swaps between non-extreme
+        cells, so swaps are accepted on a smooth all-cells statistic instead:
+        the count-weighted squared deviation of the cell means from the pooled
+        mean (whitened under Mahalanobis). Patience grows with the k(k-1)/2
+        cell pairs a proposal can hit.
+        Returns per-unit cell labels, score, iterations and convergence.
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        n_units = context.n_units
+        n_cells = len(counts)
+        standardized = context.standardized
+        
+        # Random starting split
+        labels = np.repeat(np.arange(n_cells), counts)
+        rng.shuffle(labels)
+        members = [np.flatnonzero(labels == cell) for cell in range(n_cells)]
+        group_sums = np.zeros((n_cells, context.n_metrics))
+        np.add.at(group_sums, labels, standardized)
+        pooled_means = context.totals / n_units
+        
+        def dispersion(sums: np.ndarray) -> float:
+            deviations = sums / counts[:, None] - pooled_means
+            if context.whitening is not None:
+                deviations = deviations @ context.whitening.T
+            return float(np.sum(counts[:, None] * deviations ** 2))
+        
+        smooth = dispersion(group_sums)
+        patience = max(2 * n_units, 1000) * (n_cells * (n_cells - 1) // 2)
+        stale = 0
+        converged = False
+        cell_draws = rng.integers(n_cells, size=(max_iterations, 2))
+        position_draws = rng.random((max_iterations, 2))
+        
+        iteration = 0
+        for iteration in range(max_iterations):
+            a, b = cell_draws[iteration]
+            if a != b:
+                pos_a = int(position_draws[iteration, 0] * counts[a])
+                pos_b = int(position_draws[iteration, 1] * counts[b])
+                i, k = members[a][pos_a], members[b][pos_b]
+                
+                delta = standardized[k] - standardized[i]
+                candidate_sums = group_sums.copy()
+                candidate_sums[a] += delta
+                candidate_sums[b] -= delta
+                candidate_smooth = dispersion(candidate_sums)
+                
+                if candidate_smooth < smooth:
+                    members[a][pos_a], members[b][pos_b] = k, i
+                    group_sums = candidate_sums
+                    smooth = candidate_smooth
+                    stale = 0
+                else:
+                    stale += 1
             
-            # Update best if better
-            if score < best_score:
-                best_score = score
-                best_assignment = assignment.copy()
+            if stale >= patience:
+                converged = True
+                break
             
-            # Early stopping if very good balance achieved
-            if score < 0.01:
+            if (progress_callback is not None and (iteration + 1) % PROGRESS_INTERVAL == 0
+                    and progress_callback(iteration + 1, float(context.spread_from_group_sums(group_sums, counts)),
+                                          self._labels_from_members(n_units, members) > 0)):
                 break
         
-        return best_assignment, best_score, iteration + 1
+        labels = self._labels_from_members(n_units, members)
+        
+        # Rescore from scratch to drop accumulated floating point drift
+        group_sums = np.zeros((n_cells, context.n_metrics))
+        np.add.at(group_sums, labels, standardized)
+        return labels, float(context.spread_from_group_sums(group_sums, counts)), iteration + 1, converged
     
-    def _calculate_balance_score(self, metrics: np.ndarray, assignment: np.ndarray) -> float:
+    def _labels_from_members(self, n_units: int, members: List[np.ndarray]) -> np.ndarray:
+        """Per-unit cell labels from per-cell member index arrays"""
+        labels = np.empty(n_units, dtype=int)
+        for cell, indices in enumerate(members):
+            labels[indices] = cell
+        return labels
+    
+    def _milp_optimization(self, context: DesignContext, n_treatment: int,
+                           objectives: List[str],
+                           time_limit: float = 10.0,
+                           design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool, float]:
         """
-        Calculate balance score for given assignment
-        Lower score = better balance
+        Exact assignment as a mixed-integer program (scipy.optimize.milp / HiGHS).
+        Binary x_i marks treatment; continuous e_j >= |mean_T - mean_C| on each
+        standardized metric, so minimizing mean(e) minimizes the balance score.
+        Design constraints become variable bounds (pinned units) and linear rows.
+        
+        The LP relaxation balances every metric exactly (x_i = nT / n), so the
+        dual bound stays at 0 and branch-and-bound cannot prove optimality once
+        the design is too large to enumerate (from ~30 units). The solver first
+        spends up to half of time_limit looking for any assignment within the
+        0.01 early-stop threshold of the search modes, which large designs
+        reach in well under a second; only if that fails does it minimize the
+        objective for the rest of the budget.
+        Returns the assignment, its score, branch-and-bound nodes, convergence
+        (threshold reached or proven optimal) and the linear objective mean(e).
         """
-        treatment_mask = assignment == 1
-        control_mask = assignment == 0
+        n_units, n_metrics = context.n_units, context.n_metrics
+        n_control = n_units - n_treatment
         
-        if np.sum(treatment_mask) == 0 or np.sum(control_mask) == 0:
-            return float('inf')
+        if n_treatment == 0 or n_control == 0:
+            return np.zeros(n_units), float('inf'), 0, False, None
+        
+        # mean_T - mean_C = x . z_j * (1/nT + 1/nC) - S_j / nC
+        coefficients = context.standardized.T * (1 / n_treatment + 1 / n_control)
+        offsets = context.totals / n_control
+        if context.whitening is not None:
+            # Mahalanobis: minimize the L1 norm of the whitened differences as a linear
+            # proxy; the incumbent is rescored with the true distance below
+            coefficients = context.whitening @ coefficients
+            offsets = context.whitening @ offsets
+        identity = np.eye(n_metrics)
         
-        treatment_means = np.mean(metrics[treatment_mask], axis=0)
-        control_means = np.mean(metrics[control_mask], axis=0)
+        cost = np.concatenate([np.zeros(n_units), np.full(n_metrics, 1 / n_metrics)])
+        constraints = [
+            # Exactly n_treatment treated units
+            LinearConstraint(np.concatenate([np.ones(n_units), np.zeros(n_metrics)])[None, :],
+                             n_treatment, n_treatment),
+            # e_j >= diff_j and e_j >= -diff_j
+            LinearConstraint(np.hstack([-coefficients, identity]), -offsets, np.inf),
+            LinearConstraint(np.hstack([coefficients, identity]), offsets, np.inf),
+        ]
+        integrality = np.concatenate([np.ones(n_units), np.zeros(n_metrics)])
+        lower = np.zeros(n_units + n_metrics)
+        upper = np.concatenate([np.ones(n_units), np.full(n_metrics, np.inf)])
+        
+        if design_constraints is not None:
+            lower[:n_units][design_constraints.fixed_treatment] = 1
+            upper[:n_units][design_constraints.fixed_control] = 0
+            padding = np.zeros(n_metrics)
+            if np.isfinite(design_constraints.max_population):
+                constraints.append(LinearConstraint(np.concatenate([design_constraints.population, padding])[None, :],
+                                                    -np.inf, design_constraints.max_population))
+            if np.isfinite(design_constraints.max_spend):
+                constraints.append(LinearConstraint(np.concatenate([design_constraints.spend, padding])[None, :],
+                                                    -np.inf, design_constraints.max_spend))
+            if design_constraints.state_indicator is not None:
+                state_rows = design_constraints.state_indicator.T
+                constraints.append(LinearConstraint(
+                    np.hstack([state_rows, np.zeros((state_rows.shape[0], n_metrics))]),
+                    design_constraints.min_per_state, design_constraints.max_per_state
+                ))
+        bounds = Bounds(lower, upper)
+        
+        # Feasibility pass: zero cost, so HiGHS stops at the first assignment within the threshold
+        started = time.perf_counter()
+        result = milp(np.zeros_like(cost), constraints=constraints + [LinearConstraint(cost[None, :], -np.inf, 0.01)],
+                      integrality=integrality, bounds=bounds,
+                      options={"time_limit": time_limit / 2, "disp": False})
+        nodes = int(getattr(result, 'mip_node_count', 0) or 0)
+        proven_optimal = False
+        if result.x is None:
+            remaining = max(time_limit - (time.perf_counter() - started), 0.1)
+            result = milp(cost, constraints=constraints, integrality=integrality, bounds=bounds,
+                          options={"time_limit": remaining, "disp": False})
+            nodes += int(getattr(result, 'mip_node_count', 0) or 0)
+            proven_optimal = result.status == 0
         
-        # Calculate standardized differences
-        pooled_stds = np.std(metrics, axis=0)
-        pooled_stds[pooled_stds == 0] = 1  # Avoid division by zero
+        if result.x is None:
+            raise ValueError(f"MILP found no feasible assignment within {time_limit}s: {result.message}")
         
-        standardized_diffs = np.abs(treatment_means - control_means) / pooled_stds
+        assignment = np.round(result.x[:n_units])
+        score = self._calculate_balance_score(context, assignment)
+        # Recomputed from x: the feasibility pass leaves e_j free to sit above |diff_j|
+        objective = float(np.mean(np.abs(coefficients @ assignment - offsets)))
+        converged = proven_optimal or score < 0.01
         
-        # Return mean standardized difference
-        return np.mean(standardized_diffs)
+        return assignment, score, nodes, converged, objective
     
-    def _calculate_balance_metrics(self, metrics: np.ndarray, assignment: np.ndarray) -> Dict[str, float]:
-        """Calculate detailed balance metrics"""
-        treatment_mask = assignment == 1
-        control_mask = assignment == 0
+    def _calculate_balance_score(self, context: DesignContext, assignment: np.ndarray) -> float:
+        """
+        Calculate balance score for given assignment
+        Lower score = better balance
+        """
+        n_treatment = int(np.sum(assignment == 1))
         
-        treatment_data = metrics[treatment_mask]
-        control_data = metrics[control_mask]
+        if n_treatment == 0 or n_treatment == context.n_units:
+            return float('inf')
         
-        balance_metrics = {}
-        metric_names = ['population', 'conversions', 'spend', 'revenue', 'conv_rate', 'cpm', 'ctr']
+        # Mean standardized difference, from the treatment group's sums
+        return float(context.score_from_sums(assignment @ context.standardized, n_treatment))
+    
+    def _calculate_balance_metrics(self, context: DesignContext, assignment: np.ndarray) -> Dict[str, float]:
+        """Calculate detailed balance metrics"""
+        treatment_means, control_means = context.group_means(assignment)
         
-        for i, name in enumerate(metric_names):
-            treatment_mean = np.mean(treatment_data[:, i])
-            control_mean = np.mean(control_data[:, i])
+        balance_metrics = {}
+        for i, name in enumerate(METRIC_NAMES):
+            treatment_mean = treatment_means[i]
+            control_mean = control_means[i]
             
             # Calculate percentage difference
             if control_mean != 0:
@@ -146,27 +1557,160 @@ class StatisticalMatchingEngine:
             else:
                 pct_diff = 0
             
-            balance_metrics[f'{name}_balance'] = pct_diff
+            balance_metrics[f'{name}_balance'] = float(pct_diff)
+        
+        return balance_metrics
+    
+    def _group_design_context(self, treatment_group: TestGroup,
+                              control_group: TestGroup) -> Tuple[DesignContext, np.ndarray]:
+        """Design context over treatment units followed by control units, with the matching assignment"""
+        metrics = self._extract_metrics_matrix(treatment_group.units + control_group.units)
+        assignment = np.concatenate([np.ones(len(treatment_group.units)),
+                                     np.zeros(len(control_group.units))])
+        return DesignContext(metrics), assignment
+    
+    def _calculate_cell_balance_metrics(self, context: DesignContext, labels: np.ndarray) -> Dict[str, float]:
+        """Multi-cell balance: per metric, the largest % difference of any cell mean from the holdout (cell 0)"""
+        n_cells = int(labels.max()) + 1
+        group_sums = np.zeros((n_cells, context.n_metrics))
+        np.add.at(group_sums, labels, context.metrics)
+        group_means = group_sums / np.bincount(labels, minlength=n_cells)[:, None]
+        
+        control_means = group_means[0]
+        differences = np.abs(group_means[1:] - control_means).max(axis=0)
+        
+        balance_metrics = {}
+        for i, name in enumerate(METRIC_NAMES):
+            if control_means[i] != 0:
+                pct_diff = differences[i] / control_means[i] * 100
+            else:
+                pct_diff = 0
+            balance_metrics[f'{name}_balance'] = float(pct_diff)
         
         return balance_metrics
     
     def calculate_statistical_power(self, treatment_group: TestGroup, 
                                   control_group: TestGroup, 
-                                  expected_effect: float = 0.1) -> StatisticalMetrics:
+                                  expected_effect: float = 0.1,
+                                  context: DesignContext = None,
+                                  assignment: np.ndarray = None,
+                                  n_bootstrap: Optional[int] = None,
+                                  random_seed: Optional[int] = None) -> StatisticalMetrics:
         """
-        Calculate statistical power and other metrics for the test design
+        Calculate statistical power and other metrics for the test design.
+        Pass a DesignContext (and its assignment) to reuse one already built
+        for the request; otherwise one is built from the groups' units.
+        With n_bootstrap, bias and coverage are estimated by resampling the
+        design's units (see resample_design_metrics) instead of assumed.
         """
         # Extract sample sizes
         n_treatment = treatment_group.total_population
         n_control = control_group.total_population
         
+        if context is None:
+            context, assignment = self._group_design_context(treatment_group, control_group)
+        
         # Calculate pooled variance (simplified)
-        treatment_variance = np.var([unit.conversion_rate for unit in treatment_group.units])
-        control_variance = np.var([unit.conversion_rate for unit in control_group.units])
-        pooled_variance = (treatment_variance + control_variance) / 2
+        conv_rate = METRIC_NAMES.index('conv_rate')
+        treatment_variances, control_variances = context.group_variances(assignment)
+        treatment_variance = treatment_variances[conv_rate]
+        control_variance = control_variances[conv_rate]
+        pooled_variance = float((treatment_variance + control_variance) / 2)
         
+        se, mde, power = self._power_curve(pooled_variance, n_treatment, n_control, expected_effect)
+        alpha = self.significance_level
+        
+        # Other metrics
+        mse = se ** 2
+        bias = 0  # Assuming unbiased design
+        coverage = 0.95  # 95% confidence intervals
+        if n_bootstrap:
+            resampling = self.resample_design_metrics(
+                treatment_group, control_group, n_bootstrap, random_seed=random_seed
+            )
+            bias = resampling.bootstrap_bias
+            coverage = resampling.coverage
+        
+        return StatisticalMetrics(
+            mse=mse,
+            variance=pooled_variance,
+            bias=bias,
+            coverage=coverage,
+            power=power,
+            significance_level=alpha,
+            minimum_detectable_effect=mde
+        )
+    
+    def resample_design_metrics(self, treatment_group: TestGroup, control_group: TestGroup,
+                                n_bootstrap: int = 1000,
+                                confidence_level: float = 0.95,
+                                random_seed: Optional[int] = None,
+                                n_jobs: Optional[int] = None) -> ResamplingResult:
+        """
+        Bootstrap and leave-one-geo-out jackknife of the design's lift estimate
+        (ratio of conversions per population, treatment vs control).
+        Units are resampled within their group as (n_bootstrap x n) index
+        matrices, evaluated in chunks across worker processes. Each resample also
+        gets a jackknife standard error from O(1) leave-one-out updates of its
+        group sums; coverage is the share of resamples whose normal interval
+        (resample estimate +/- z * jackknife SE) contains the full-data estimate.
+        """
+        treatment = self._extract_metrics_matrix(treatment_group.units)
+        control = self._extract_metrics_matrix(control_group.units)
+        if len(treatment) < 2 or len(control) < 2:
+            raise ValueError("Resampling needs at least two units in each group")
+        
+        conversions, population = METRIC_NAMES.index('conversions'), METRIC_NAMES.index('population')
+        groups = (treatment[:, conversions], treatment[:, population],
+                  control[:, conversions], control[:, population])
+        if treatment[:, population].sum() <= 0 or control[:, conversions].sum() <= 0:
+            raise ValueError("Groups need positive population and control conversions")
+        
+        # Full-data estimate and its jackknife
+        identity = (np.arange(len(treatment))[None, :], np.arange(len(control))[None, :])
+        estimate, jackknife_estimates = _resampled_ratio_lifts(*groups, *identity)
+        estimate = float(estimate[0])
+        jackknife_estimates = jackknife_estimates[0]
+        n_units = len(jackknife_estimates)
+        jackknife_mean = jackknife_estimates.mean()
+        jackknife_bias = (n_units - 1) * (jackknife_mean - estimate)
+        jackknife_variance = (n_units - 1) / n_units * np.sum((jackknife_estimates - jackknife_mean) ** 2)
+        
+        # Bootstrap resamples in fixed-size seeded chunks, spread across workers
+        shares = _chunk_sizes(n_bootstrap)
+        n_jobs = _pool_size(n_jobs, len(shares), n_bootstrap * n_units)
+        seeds = np.random.SeedSequence(random_seed).spawn(len(shares))
+        tasks = [(*groups, share, seed) for share, seed in zip(shares, seeds)]
+        chunks = _map_in_processes(_bootstrap_chunk, tasks, n_jobs)
+        bootstrap_estimates = np.concatenate([chunk[0] for chunk in chunks])
+        bootstrap_se = np.concatenate([chunk[1] for chunk in chunks])
+        
+        alpha = 1 - confidence_level
+        z = stats.norm.ppf(1 - alpha / 2)
+        lower, upper = np.quantile(bootstrap_estimates, [alpha / 2, 1 - alpha / 2])
+        coverage = np.mean(np.abs(bootstrap_estimates - estimate) <= z * bootstrap_se)
+        
+        return ResamplingResult(
+            estimate=estimate,
+            bootstrap_bias=float(bootstrap_estimates.mean() - estimate),
+            bootstrap_variance=float(bootstrap_estimates.var(ddof=1)),
+            jackknife_bias=float(jackknife_bias),
+            jackknife_variance=float(jackknife_variance),
+            confidence_interval=[float(lower), float(upper)],
+            coverage=float(coverage),
+            n_bootstrap=n_bootstrap,
+            confidence_level=confidence_level
+        )
+    
+    def _power_curve(self, pooled_variance: float, n_treatment, n_control, expected_effect,
+                     duration_scale=1.0) -> Tuple[Any, Any, Any]:
+        """
+        Two-sided z-test standard error, MDE and power; every argument broadcasts,
+        so a whole grid of designs is one NumPy/SciPy evaluation.
+        duration_scale multiplies the standard error (sqrt(base / duration)).
+        """
         # Standard error
-        se = np.sqrt(pooled_variance * (1/n_treatment + 1/n_control))
+        se = np.sqrt(pooled_variance * (1/n_treatment + 1/n_control)) * duration_scale
         
         # Minimum detectable effect
         alpha = self.significance_level
@@ -180,21 +1724,241 @@ class StatisticalMatchingEngine:
         z_stat = expected_effect / se
         power = 1 - stats.norm.cdf(z_alpha - z_stat) + stats.norm.cdf(-z_alpha - z_stat)
         
-        # Other metrics
-        mse = se ** 2
-        bias = 0  # Assuming unbiased design
-        coverage = 0.95  # 95% confidence intervals
+        return se, mde, power
+    
+    def power_grid(self, request: PowerGridRequest) -> PowerGridResult:
+        """
+        Power and MDE over durations x expected effects x treatment shares in one
+        broadcasted evaluation. The design's pooled conversion-rate variance comes
+        from calculate_statistical_power; each share re-splits the groups' total
+        population, and each duration scales the standard error by
+        sqrt(base_duration_days / duration).
+        """
+        if any(duration <= 0 for duration in request.durations):
+            raise ValueError("Durations must be positive")
+        if any(not 0 < share < 1 for share in request.treatment_shares):
+            raise ValueError("Treatment shares must be between 0 and 1")
         
-        return StatisticalMetrics(
-            mse=mse,
-            variance=pooled_variance,
-            bias=bias,
-            coverage=coverage,
-            power=power,
+        variance = self.calculate_statistical_power(request.treatment_group, request.control_group).variance
+        total_population = request.treatment_group.total_population + request.control_group.total_population
+        
+        # Axes: duration x effect x share
+        durations = np.asarray(request.durations, dtype=float)[:, None, None]
+        effects = np.asarray(request.expected_effects, dtype=float)[None, :, None]
+        shares = np.asarray(request.treatment_shares, dtype=float)[None, None, :]
+        
+        _, mde, power = self._power_curve(
+            variance, shares * total_population, (1 - shares) * total_population, effects,
+            duration_scale=np.sqrt(request.base_duration_days / durations)
+        )
+        
+        return PowerGridResult(
+            durations=request.durations,
+            expected_effects=request.expected_effects,
+            treatment_shares=request.treatment_shares,
+            power=power.tolist(),
+            minimum_detectable_effect=mde[:, 0, :].tolist(),
+            significance_level=self.significance_level,
+            target_power=self.min_power
+        )
+    
+    def solve_budget_for_power(self, request: PowerSolverRequest,
+                               tolerance: float = 1e-6, max_steps: int = 100) -> PowerSolverResult:
+        """
+        Smallest daily budget reaching min_power for every design x duration, by
+        one vectorized bisection over the whole (designs x durations) grid.
+        A daily budget buys budget / incremental_cpa incremental conversions a
+        day; spread over the treatment population and expressed per
+        base_duration_days window, that is the conversion-rate lift fed to
+        _power_curve, whose standard error shrinks with sqrt(base / duration)
+        as in power_grid. Power is increasing in the budget, and the budget at
+        which the lift equals the one-sided MDE always reaches min_power, so it
+        brackets the root. The recommendation per design is the feasible
+        combination with the lowest total spend.
+        """
+        if not request.designs:
+            raise ValueError("At least one design is required")
+        if any(duration <= 0 for duration in request.durations):
+            raise ValueError("Durations must be positive")
+        if not 0 < request.min_power < 1:
+            raise ValueError("min_power must be between 0 and 1")
+        
+        variances, n_treatment, n_control, cpas = [], [], [], []
+        for design in request.designs:
+            cpa = design.incremental_cpa or request.incremental_cpa
+            if not cpa or cpa <= 0:
+                raise ValueError(f"Design {design.design_id} needs a positive incremental_cpa")
+            metrics = self.calculate_statistical_power(design.treatment_group, design.control_group)
+            if not np.isfinite(metrics.variance) or metrics.variance <= 0:
+                # A zero standard error makes any lift "detectable" at a $0 budget
+                raise ValueError(f"Design {design.design_id} has no conversion-rate variance to size a test from; "
+                                 f"it needs at least two units per group with differing rates")
+            variances.append(metrics.variance)
+            n_treatment.append(design.treatment_group.total_population)
+            n_control.append(design.control_group.total_population)
+            cpas.append(cpa)
+        
+        # Axes: design x duration
+        variances = np.asarray(variances, dtype=float)[:, None]
+        n_treatment = np.asarray(n_treatment, dtype=float)[:, None]
+        n_control = np.asarray(n_control, dtype=float)[:, None]
+        if np.any(n_treatment <= 0) or np.any(n_control <= 0):
+            raise ValueError("Both groups need a positive total population")
+        # Conversion-rate lift per unit of daily budget
+        lift_per_budget = request.base_duration_days / (np.asarray(cpas, dtype=float)[:, None] * n_treatment)
+        duration_scale = np.sqrt(request.base_duration_days / np.asarray(request.durations, dtype=float))[None, :]
+        
+        z_alpha = stats.norm.ppf(1 - self.significance_level / 2)
+        se = np.sqrt(variances * (1 / n_treatment + 1 / n_control)) * duration_scale
+        
+        def power_at(budget):
+            z_stat = budget * lift_per_budget / se
+            return 1 - stats.norm.cdf(z_alpha - z_stat) + stats.norm.cdf(-z_alpha - z_stat)
+        
+        lower = np.zeros_like(se)
+        upper = (z_alpha + stats.norm.ppf(request.min_power)) * se / lift_per_budget
+        for _ in range(max_steps):
+            middle = (lower + upper) / 2
+            reached = power_at(middle) >= request.min_power
+            upper = np.where(reached, middle, upper)
+            lower = np.where(reached, lower, middle)
+            if np.all(upper - lower <= tolerance * np.maximum(upper, 1.0)):
+                break
+        
+        daily = upper
+        total = daily * np.asarray(request.durations, dtype=float)[None, :]
+        feasible = np.ones_like(daily, dtype=bool)
+        if request.max_daily_budget is not None:
+            feasible &= daily <= request.max_daily_budget
+        power = power_at(daily)
+        
+        solutions = []
+        for d, design in enumerate(request.designs):
+            solution = BudgetSolution(
+                design_id=design.design_id,
+                daily_budget=[float(value) if ok else None for value, ok in zip(daily[d], feasible[d])],
+                total_budget=[float(value) if ok else None for value, ok in zip(total[d], feasible[d])]
+            )
+            if feasible[d].any():
+                best = int(np.argmin(np.where(feasible[d], total[d], np.inf)))
+                solution.recommended_daily_budget = float(daily[d, best])
+                solution.recommended_duration_days = request.durations[best]
+                solution.recommended_total_budget = float(total[d, best])
+                solution.power = float(power[d, best])
+            solutions.append(solution)
+        
+        return PowerSolverResult(
+            durations=request.durations,
+            designs=solutions,
+            min_power=request.min_power,
+            significance_level=self.significance_level
+        )
+    
+    def simulate_power(self, request: PowerSimulationRequest) -> PowerSimulationResult:
+        """
+        Monte Carlo power analysis on historical geo data.
+        Each simulation draws a placebo assignment of the units, injects each
+        relative lift into the treated group's expected conversions, draws
+        Poisson test-period conversions and re-estimates the lift with the
+        ratio estimator (conversions per population, treatment vs control).
+        The lift-0 estimates are the placebo null distribution: its two-sided
+        quantiles are the critical values, and power at each effect size is
+        the share of estimates outside them. Simulations are vectorized in
+        blocks and split across a process pool.
+        """
+        n_units = len(request.units)
+        n_treatment = int(n_units * request.treatment_percentage)
+        if n_treatment == 0 or n_treatment == n_units:
+            raise ValueError("Both groups need at least one unit")
+        
+        metrics = self._extract_metrics_matrix(request.units)
+        conversions = metrics[:, METRIC_NAMES.index('conversions')]
+        population = metrics[:, METRIC_NAMES.index('population')]
+        if conversions.sum() <= 0 or np.any(population <= 0):
+            raise ValueError("Units need historical conversions and positive population")
+        
+        effect_sizes = sorted(request.effect_sizes)
+        shares = _chunk_sizes(request.n_simulations)
+        n_jobs = _pool_size(request.n_jobs, len(shares),
+                            request.n_simulations * n_units * (len(effect_sizes) + 1))
+        seeds = np.random.SeedSequence(request.random_seed).spawn(len(shares))
+        tasks = [(conversions, population, n_treatment, effect_sizes, share, seed)
+                 for share, seed in zip(shares, seeds)]
+        estimates = np.concatenate(_map_in_processes(_simulate_power_chunk, tasks, n_jobs), axis=1)
+        
+        alpha = request.significance_level
+        null = estimates[0]
+        lower, upper = np.nanquantile(null, [alpha / 2, 1 - alpha / 2])
+        power = np.mean((estimates[1:] < lower) | (estimates[1:] > upper), axis=1)
+        
+        return PowerSimulationResult(
+            effect_sizes=effect_sizes,
+            power=power.tolist(),
+            minimum_detectable_effect=self._interpolate_mde(effect_sizes, power, request.target_power),
+            critical_values=[float(lower), float(upper)],
+            null_standard_error=float(np.nanstd(null)),
+            n_simulations=request.n_simulations,
             significance_level=alpha,
-            minimum_detectable_effect=mde
+            target_power=request.target_power
         )
     
+    def _interpolate_mde(self, effect_sizes: List[float], power: np.ndarray,
+                         target_power: float) -> Optional[float]:
+        """Smallest effect reaching target_power, linearly interpolated on the power curve"""
+        reached = np.flatnonzero(power >= target_power)
+        if reached.size == 0:
+            return None
+        i = int(reached[0])
+        if i == 0 or power[i] == power[i - 1]:
+            return float(effect_sizes[i])
+        fraction = (target_power - power[i - 1]) / (power[i] - power[i - 1])
+        return float(effect_sizes[i - 1] + fraction * (effect_sizes[i] - effect_sizes[i - 1]))
+    
+    def _pairwise_rate_similarity(self, treatment_rates: np.ndarray, control_rates: np.ndarray,
+                                  floor: float = 0.001) -> float:
+        """
+        Mean over all treatment x control pairs of 1 - min(|a - b| / max(a, b, floor), 1).
+        For non-negative rates a pair scores min / max when max(a, b) >= floor
+        and 1 - |a - b| / floor otherwise, so the sum over all pairs comes from
+        the sorted control rates and prefix sums of b and 1 / b in
+        O((n + m) log m). Negative rates fall back to broadcasting in
+        memory-bounded tiles.
+        """
+        n_treatment, n_control = len(treatment_rates), len(control_rates)
+        if n_treatment == 0 or n_control == 0:
+            return float('nan')
+        
+        if treatment_rates.min() < 0 or control_rates.min() < 0:
+            total = 0.0
+            block = max(1, MAX_MASK_BLOCK_BYTES // (n_control * 8 * 3))
+            for start in range(0, n_treatment, block):
+                a = treatment_rates[start:start + block, None]
+                score = np.abs(a - control_rates) / np.maximum(np.maximum(a, control_rates), floor)
+                total += np.sum(1 - np.minimum(score, 1))
+            return total / (n_treatment * n_control)
+        
+        b = np.sort(control_rates)
+        prefix = np.concatenate([[0.0], np.cumsum(b)])
+        inverse = np.where(b >= floor, 1 / np.maximum(b, floor), 0.0)
+        inverse_suffix = np.concatenate([np.cumsum(inverse[::-1])[::-1], [0.0]])
+        n_small = np.searchsorted(b, floor, side='left')  # controls below the floor
+        
+        a = treatment_rates
+        at_most = np.searchsorted(b, a, side='right')  # controls <= a
+        
+        # a >= floor: controls <= a score b / a, larger ones score a / b
+        with np.errstate(divide='ignore', invalid='ignore'):
+            above = prefix[at_most] / a + a * inverse_suffix[at_most]
+        
+        # a < floor: controls >= floor score a / b, smaller ones 1 - |a - b| / floor
+        small_at_most = np.minimum(at_most, n_small)
+        absolute_differences = (a * small_at_most - prefix[small_at_most]
+                                + (prefix[n_small] - prefix[small_at_most]) - a * (n_small - small_at_most))
+        below = a * inverse_suffix[n_small] + n_small - absolute_differences / floor
+        
+        total = np.sum(np.where(a >= floor, above, below))
+        return float(total / (n_treatment * n_control))
+    
     def validate_test_quality(self, treatment_group: TestGroup, 
                             control_group: TestGroup,
                             budget_config: Any,
@@ -244,14 +2008,10 @@ class StatisticalMatchingEngine:
             recommendations.append("Extend test duration or include higher-converting markets")
         
         # 5. Balance Score
-        balance_scores = []
-        for unit_t in treatment_group.units:
-            for unit_c in control_group.units:
-                # Simple similarity score between units
-                score = abs(unit_t.conversion_rate - unit_c.conversion_rate) / max(unit_t.conversion_rate, unit_c.conversion_rate, 0.001)
-                balance_scores.append(1 - min(score, 1))  # Convert to 0-1 scale
-        
-        balance_score = np.mean(balance_scores) * 100
+        balance_score = self._pairwise_rate_similarity(
+            np.fromiter((unit.conversion_rate for unit in treatment_group.units), dtype=float),
+            np.fromiter((unit.conversion_rate for unit in control_group.units), dtype=float)
+        ) * 100
         
         # 6. Overall Quality Score
         quality_factors = [
@@ -280,3 +2040,140 @@ class StatisticalMatchingEngine:
             recommendations=recommendations,
             warnings=warnings
         )
+
+def _run_search_chain(context: DesignContext, n_treatment: int, request: OptimizationRequest,
+                      seed: np.random.SeedSequence,
+                      max_iterations: int,
+                      design_constraints: Optional[DesignConstraints] = None) -> Tuple[np.ndarray, float, int, bool]:
+    """Process-pool entry point for a single optimization chain"""
+    engine = StatisticalMatchingEngine()
+    return engine._run_search(context, n_treatment, request, np.random.default_rng(seed), max_iterations,
+                              design_constraints=design_constraints)
+
+def _run_stratum(metrics: np.ndarray, n_treatment: int, request: OptimizationRequest,
+                 seed: np.random.SeedSequence,
+                 panel: Optional[np.ndarray] = None) -> Tuple[np.ndarray, int, bool]:
+    """Process-pool entry point optimizing the split inside a single stratum"""
+    n_units = metrics.shape[0]
+    if n_treatment == 0 or n_treatment == n_units:
+        # Nothing to optimize: the whole stratum lands in one group
+        return np.full(n_units, 1.0 if n_treatment else 0.0), 0, True
+    
+    engine = StatisticalMatchingEngine()
+    context = DesignContext(metrics, objective=request.balance_objective, panel=panel)
+    if request.method == OptimizationMethod.MILP:
+        assignment, _, iterations, converged, _ = engine._milp_optimization(
+            context, n_treatment, request.objectives, request.time_limit_seconds
+        )
+    else:
+        assignment, _, iterations, converged = engine._run_search(
+            context, n_treatment, request, np.random.default_rng(seed)
+        )
+    return assignment, iterations, converged
+
+def _simulate_power_chunk(conversions: np.ndarray, population: np.ndarray, n_treatment: int,
+                          effect_sizes: List[float], n_simulations: int,
+                          seed: np.random.SeedSequence) -> np.ndarray:
+    """
+    Process-pool entry point for simulate_power: lift estimates of shape
+    (1 + len(effect_sizes), n_simulations), row 0 being the placebo (no lift) run.
+    Group sums come from one mask product per block, and Poisson group totals
+    are drawn directly from the summed expected conversions.
+    """
+    rng = np.random.default_rng(seed)
+    engine = StatisticalMatchingEngine()
+    n_units = len(conversions)
+    values = np.column_stack([conversions, population])
+    total_conversions, total_population = values.sum(axis=0)
+    lifts = np.concatenate([[0.0], effect_sizes])[:, None]
+    
+    estimates = np.empty((len(lifts), n_simulations))
+    block = max(1, MAX_MASK_BLOCK_BYTES // (n_units * 24))
+    for start in range(0, n_simulations, block):
+        count = min(block, n_simulations - start)
+        masks = engine._random_assignment_masks(n_units, n_treatment, count, rng)
+        treated_conversions, treated_population = (masks @ values).T
+        
+        # Control draws are shared across effect sizes (common random numbers)
+        observed_treatment = rng.poisson(treated_conversions * (1 + lifts))
+        observed_control = rng.poisson(total_conversions - treated_conversions)
+        treatment_rate = observed_treatment / treated_population
+        control_rate = observed_control / (total_population - treated_population)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimates[:, start:start + count] = np.where(control_rate > 0, treatment_rate / control_rate - 1, np.nan)
+    
+    return estimates
+
+def _resampled_ratio_lifts(treatment_conversions: np.ndarray, treatment_population: np.ndarray,
+                           control_conversions: np.ndarray, control_population: np.ndarray,
+                           treatment_index: np.ndarray, control_index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ratio-estimator lifts for a block of resamples given as index matrices
+    (rows are resamples), plus every leave-one-out lift of each resample,
+    shape (rows, n_treatment + n_control), from group sums minus one unit.
+    """
+    c_t, p_t = treatment_conversions[treatment_index], treatment_population[treatment_index]
+    c_c, p_c = control_conversions[control_index], control_population[control_index]
+    sums_c_t, sums_p_t = c_t.sum(axis=1, keepdims=True), p_t.sum(axis=1, keepdims=True)
+    sums_c_c, sums_p_c = c_c.sum(axis=1, keepdims=True), p_c.sum(axis=1, keepdims=True)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimates = (sums_c_t / sums_p_t) / (sums_c_c / sums_p_c) - 1
+        leave_out_treatment = ((sums_c_t - c_t) / (sums_p_t - p_t)) / (sums_c_c / sums_p_c) - 1
+        leave_out_control = (sums_c_t / sums_p_t) / ((sums_c_c - c_c) / (sums_p_c - p_c)) - 1
+    
+    return estimates[:, 0], np.hstack([leave_out_treatment, leave_out_control])
+
+def _bootstrap_chunk(treatment_conversions: np.ndarray, treatment_population: np.ndarray,
+                     control_conversions: np.ndarray, control_population: np.ndarray,
+                     n_resamples: int, seed: np.random.SeedSequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Process-pool entry point for resample_design_metrics: bootstrap lift
+    estimates and their jackknife standard errors for n_resamples resamples.
+    """
+    rng = np.random.default_rng(seed)
+    n_treatment, n_control = len(treatment_conversions), len(control_conversions)
+    n_units = n_treatment + n_control
+    
+    estimates = np.empty(n_resamples)
+    standard_errors = np.empty(n_resamples)
+    block = max(1, MAX_MASK_BLOCK_BYTES // (n_units * 48))
+    for start in range(0, n_resamples, block):
+        count = min(block, n_resamples - start)
+        treatment_index = rng.integers(n_treatment, size=(count, n_treatment))
+        control_index = rng.integers(n_control, size=(count, n_control))
+        block_estimates, leave_one_out = _resampled_ratio_lifts(
+            treatment_conversions, treatment_population, control_conversions, control_population,
+            treatment_index, control_index
+        )
+        estimates[start:start + count] = block_estimates
+        standard_errors[start:start + count] = np.sqrt((n_units - 1) * np.nanvar(leave_one_out, axis=1))
+    
+    return estimates, standard_errors
+
+def _chunk_sizes(n_draws: int) -> List[int]:
+    """
+    Split n_draws into DRAWS_PER_CHUNK-sized tasks. Each task gets its own
+    spawned seed, so a fixed random_seed gives the same draws however the
+    tasks are spread over workers.
+    """
+    return [min(DRAWS_PER_CHUNK, n_draws - start) for start in range(0, n_draws, DRAWS_PER_CHUNK)]
+
+def _pool_size(n_jobs: Optional[int], n_tasks: int, work_cells: float) -> int:
+    """
+    Worker processes for a _map_in_processes call: the requested count (default
+    the CPU count) capped by the number of tasks, or 1 when the job is under
+    PARALLEL_MIN_CELLS draws x units and starting a pool would cost more than it saves.
+    """
+    if work_cells < PARALLEL_MIN_CELLS:
+        return 1
+    return max(1, min(n_jobs or os.cpu_count() or 1, n_tasks))
+
+def _map_in_processes(function, tasks: List[tuple], n_jobs: int) -> List[Any]:
+    """Apply function to each argument tuple, across worker processes when n_jobs > 1"""
+    if n_jobs <= 1 or len(tasks) <= 1:
+        return [function(*args) for args in tasks]
+    
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+        futures = [pool.submit(function, *args) for args in tasks]
+        return [future.result() for future in futures]
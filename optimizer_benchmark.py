@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from models import GeographicUnit, OptimizationRequest
+from statistical_engine import StatisticalMatchingEngine
+
+DEFAULT_SIZES = [50, 500, 5000, 40000]
+
+# Benchmark modes: request overrides on top of the common settings
+MODES = {
+    "random_search": {"method": "random_search"},
+    "swap_search": {"method": "swap_search"},
+    "annealing": {"method": "annealing"},
+    "matched_pairs": {"method": "matched_pairs"},
+    "rerandomization": {"method": "rerandomization", "acceptance_threshold": 0.02, "n_accepted": 10},
+    "milp": {"method": "milp", "time_limit_seconds": 10.0},
+    "stratified_swap": {"method": "swap_search", "stratify_by": "population", "n_jobs": 1},
+    "mahalanobis_swap": {"method": "swap_search", "balance_objective": "mahalanobis"},
+    "low_memory_random": {"method": "random_search", "low_memory": True},
+}
+
+# MILP grows with the unit count; beyond this it only measures the time limit
+MILP_MAX_UNITS = 500
+
+STATES = ["CA", "TX", "FL", "NY", "PA", "IL", "OH", "GA", "NC", "MI"]
+
+def print_separator(title: str):
+    """Print a separator with a title."""
+    print("\n" + "=" * 80)
+    print(f" {title} ".center(80, "="))
+    print("=" * 80 + "\n")
+
+def generate_units(n_units: int, seed: int = 0) -> List[GeographicUnit]:
+    """
+    Seeded synthetic ZIP-level units. Population is log-normal; conversions,
+    spend and revenue scale with it, so the metrics are correlated the way
+    real geo data is.
+    """
+    rng = np.random.default_rng(seed)
+    population = rng.lognormal(9.0, 1.0, n_units).astype(int) + 100
+    conversion_rate = rng.uniform(0.001, 0.02, n_units)
+    conversions = (population * conversion_rate).astype(int)
+    spend = population * rng.uniform(0.05, 0.5, n_units)
+    revenue = spend * rng.uniform(1.0, 4.0, n_units)
+    cpm = rng.uniform(5.0, 20.0, n_units)
+    ctr = rng.uniform(0.005, 0.03, n_units)
+    states = rng.integers(len(STATES), size=n_units)
+    dmas = rng.integers(200, size=n_units)
+    
+    return [
+        GeographicUnit(
+            id=f"{i:05d}",
+            name=f"ZIP {i:05d}",
+            type="zip",
+            population=int(population[i]),
+            historical_conversions=int(conversions[i]),
+            historical_spend=float(spend[i]),
+            historical_revenue=float(revenue[i]),
+            conversion_rate=float(conversions[i] / population[i]),
+            cpm=float(cpm[i]),
+            ctr=float(ctr[i]),
+            state=STATES[states[i]],
+            dma=f"DMA {dmas[i]:03d}"
+        )
+        for i in range(n_units)
+    ]
+
+def run_case(engine: StatisticalMatchingEngine, units: List[GeographicUnit], mode: str,
+             max_iterations: int, repeats: int, seed: int) -> Dict[str, Any]:
+    """Time one mode on one unit set (best of `repeats`), then trace its peak memory in a separate run"""
+    request = OptimizationRequest(
+        available_units=units,
+        objectives=["conversions"],
+        constraints={},
+        max_iterations=max_iterations,
+        random_seed=seed,
+        **MODES[mode]
+    )
+    
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = engine.optimize_geo_assignment(request)
+        timings.append(time.perf_counter() - start)
+    
+    # tracemalloc slows allocation-heavy code, so memory is measured apart from timing
+    tracemalloc.start()
+    engine.optimize_geo_assignment(request)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    
+    return {
+        "n_units": len(units),
+        "mode": mode,
+        "seconds": min(timings),
+        "seconds_all": timings,
+        "optimization_score": result.optimization_score,
+        "max_balance_pct": max(result.balance_metrics.values()) if result.balance_metrics else None,
+        "iterations": result.iterations,
+        "converged": result.convergence_achieved,
+        "peak_memory_mb": peak_bytes / 2 ** 20
+    }
+
+def independent_score(units: List[GeographicUnit], treatment_ids: List[str]) -> float:
+    """Mean |standardized mean difference| recomputed from the raw unit fields, constant metrics counting 0"""
+    metrics = np.array([[unit.population, unit.historical_conversions, unit.historical_spend,
+                         unit.historical_revenue, unit.conversion_rate, unit.cpm, unit.ctr]
+                        for unit in units], dtype=float)
+    treated = np.isin([unit.id for unit in units], treatment_ids)
+    stds = metrics.std(axis=0)
+    constant = np.all(metrics == metrics[0], axis=0)
+    differences = np.abs(metrics[treated].mean(axis=0) - metrics[~treated].mean(axis=0))
+    return float(np.mean(np.where(constant, 0.0, differences / np.where(constant, 1.0, stds))))
+
+def check_constant_metric(engine: StatisticalMatchingEngine, seed: int) -> List[str]:
+    """
+    Regression check: a metric that is constant across units must not distort
+    the reported score (round-off stds once scaled it by ~1e17), and random
+    search must still stop early once the design is balanced.
+    """
+    units = [unit.copy(update={"ctr": 0.01}) for unit in generate_units(400, seed=seed)]
+    failures = []
+    for mode in ("random_search", "swap_search", "annealing"):
+        request = OptimizationRequest(
+            available_units=units, objectives=["conversions"], constraints={},
+            max_iterations=10000, random_seed=seed, **MODES[mode]
+        )
+        result = engine.optimize_geo_assignment(request)
+        expected = independent_score(units, result.treatment_units)
+        if abs(result.optimization_score - expected) > 1e-6:
+            failures.append(f"{mode}: reported score {result.optimization_score:.6f} vs recomputed {expected:.6f}")
+        if mode == "random_search" and result.optimization_score < 0.01 and not result.convergence_achieved:
+            failures.append(f"{mode}: balanced design did not stop early ({result.iterations} iterations)")
+    return failures
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline_path: str,
+                        time_tolerance: float, score_tolerance: float) -> List[str]:
+    """Regressions against a previous results file: slower or worse-balanced runs beyond tolerance"""
+    with open(baseline_path) as f:
+        baseline = {(run["n_units"], run["mode"]): run for run in json.load(f)["results"]}
+    
+    regressions = []
+    for run in results:
+        previous = baseline.get((run["n_units"], run["mode"]))
+        if previous is None:
+            continue
+        if run["seconds"] > previous["seconds"] * (1 + time_tolerance):
+            regressions.append(
+                f"{run['mode']} @ {run['n_units']}: {run['seconds']:.3f}s vs {previous['seconds']:.3f}s"
+            )
+        if run["optimization_score"] > previous["optimization_score"] * (1 + score_tolerance) + 1e-9:
+            regressions.append(
+                f"{run['mode']} @ {run['n_units']}: score {run['optimization_score']:.5f} "
+                f"vs {previous['optimization_score']:.5f}"
+            )
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark StatisticalMatchingEngine optimizer modes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--max-iterations", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="optimizer_benchmark_results.json")
+    parser.add_argument("--baseline", help="previous results file to check for regressions")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--score-tolerance", type=float, default=0.10)
+    parser.add_argument("--check", action="store_true", help="run the correctness checks only")
+    args = parser.parse_args(argv)
+    
+    engine = StatisticalMatchingEngine()
+    
+    if args.check:
+        print_separator("Correctness checks")
+        failures = check_constant_metric(engine, args.seed)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if not failures:
+            print("✅ Constant-metric scores match recomputed balance")
+        return 1 if failures else 0
+    results = []
+    
+    for n_units in args.sizes:
+        print_separator(f"{n_units} units")
+        units = generate_units(n_units, seed=args.seed)
+        
+        for mode in args.modes:
+            if mode == "milp" and n_units > MILP_MAX_UNITS:
+                print(f"{mode:>20}: skipped (more than {MILP_MAX_UNITS} units)")
+                continue
+            
+            run = run_case(engine, units, mode, args.max_iterations, args.repeats, args.seed)
+            results.append(run)
+            print(f"{mode:>20}: {run['seconds']:8.3f}s  score {run['optimization_score']:.5f}  "
+                  f"peak {run['peak_memory_mb']:8.1f} MB  iterations {run['iterations']}")
+    
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "settings": {
+            "max_iterations": args.max_iterations,
+            "repeats": args.repeats,
+            "seed": args.seed
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.time_tolerance, args.score_tolerance)
+        if regressions:
+            print_separator("Regressions")
+            for regression in regressions:
+                print(f"❌ {regression}")
+            return 1
+        print("✅ No regressions against baseline")
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import os
+import sys
+from typing import List
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from models import GeographicUnit, TestGroup
+from statistical_engine import StatisticalMatchingEngine
+
+def synthetic_units(n_units: int, seed: int = 0) -> List[GeographicUnit]:
+    """Seeded ZIP-level units with log-normal population and correlated metrics"""
+    rng = np.random.default_rng(seed)
+    population = rng.lognormal(9.0, 1.0, n_units).astype(int) + 100
+    conversions = (population * rng.uniform(0.001, 0.02, n_units)).astype(int)
+    spend = population * rng.uniform(0.05, 0.5, n_units)
+    return [
+        GeographicUnit(
+            id=f"{i:05d}",
+            name=f"ZIP {i:05d}",
+            type="zip",
+            population=int(population[i]),
+            historical_conversions=int(conversions[i]),
+            historical_spend=float(spend[i]),
+            historical_revenue=float(spend[i] * rng.uniform(1.0, 4.0)),
+            conversion_rate=float(conversions[i] / population[i]),
+            cpm=float(rng.uniform(5.0, 20.0)),
+            ctr=float(rng.uniform(0.005, 0.03))
+        )
+        for i in range(n_units)
+    ]
+
+def group_of(units: List[GeographicUnit], group_type: str) -> TestGroup:
+    return TestGroup(
+        group_id=group_type,
+        group_type=group_type,
+        units=units,
+        total_population=sum(unit.population for unit in units),
+        historical_metrics={},
+        allocation_percentage=50.0
+    )
+
+@pytest.fixture
+def engine() -> StatisticalMatchingEngine:
+    return StatisticalMatchingEngine()
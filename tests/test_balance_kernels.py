@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from models import OptimizationRequest
+
+from tests.conftest import synthetic_units
+
+def recomputed_score(units, treatment_ids) -> float:
+    """Mean |standardized mean difference| from the raw unit fields, constant metrics counting 0"""
+    metrics = np.array([[unit.population, unit.historical_conversions, unit.historical_spend,
+                         unit.historical_revenue, unit.conversion_rate, unit.cpm, unit.ctr]
+                        for unit in units], dtype=float)
+    treated = np.isin([unit.id for unit in units], treatment_ids)
+    constant = np.all(metrics == metrics[0], axis=0)
+    differences = np.abs(metrics[treated].mean(axis=0) - metrics[~treated].mean(axis=0))
+    return float(np.mean(np.where(constant, 0.0, differences / np.where(constant, 1.0, metrics.std(axis=0)))))
+
+def naive_rate_similarity(treatment_rates, control_rates, floor=0.001) -> float:
+    """The original pairwise loop"""
+    return float(np.mean([
+        1 - min(abs(a - b) / max(a, b, floor), 1)
+        for a in treatment_rates for b in control_rates
+    ]))
+
+@pytest.mark.parametrize("method", ["random_search", "swap_search", "annealing"])
+def test_constant_metric_does_not_distort_the_score(engine, method):
+    units = [unit.copy(update={"ctr": 0.01}) for unit in synthetic_units(400, seed=1)]
+    result = engine.optimize_geo_assignment(OptimizationRequest(
+        available_units=units, objectives=["conversions"], constraints={},
+        method=method, max_iterations=10000, random_seed=1, n_jobs=1
+    ))
+    
+    assert result.optimization_score == pytest.approx(recomputed_score(units, result.treatment_units), abs=1e-6)
+    if method == "random_search" and result.optimization_score < 0.01:
+        assert result.convergence_achieved and result.iterations < 10000
+
+def test_swap_search_incremental_score_matches_a_rescore(engine):
+    units = synthetic_units(300, seed=2)
+    request = OptimizationRequest(available_units=units, objectives=["conversions"], constraints={})
+    context = engine.design_context(request)
+    
+    reports = []
+    def record(iteration, best_score, best_assignment):
+        reports.append((best_score, engine._calculate_balance_score(context, best_assignment)))
+        return False
+    
+    engine._swap_local_search(context, 150, request.objectives, max_iterations=20000,
+                              rng=np.random.default_rng(2), progress_callback=record)
+    
+    assert reports
+    for incremental, rescored in reports:
+        assert incremental == pytest.approx(rescored, abs=1e-9)
+
+def test_swap_sum_updates_match_a_rescore(engine):
+    units = synthetic_units(200, seed=4)
+    context = engine.design_context(OptimizationRequest(available_units=units, objectives=[], constraints={}))
+    rng = np.random.default_rng(4)
+    
+    assignment = np.zeros(200)
+    assignment[rng.choice(200, 80, replace=False)] = 1
+    treatment_sums = assignment @ context.standardized
+    for _ in range(2000):
+        i = rng.choice(np.flatnonzero(assignment == 1))
+        k = rng.choice(np.flatnonzero(assignment == 0))
+        treatment_sums = treatment_sums + context.standardized[k] - context.standardized[i]
+        assignment[i], assignment[k] = 0, 1
+    
+    assert float(context.score_from_sums(treatment_sums, 80)) == pytest.approx(
+        engine._calculate_balance_score(context, assignment), abs=1e-9
+    )
+
+@pytest.mark.parametrize("case", ["spread", "near_floor", "ties", "negative", "zeros"])
+def test_rate_similarity_matches_the_pairwise_loop(engine, case):
+    rng = np.random.default_rng(5)
+    if case == "spread":
+        treatment, control = rng.uniform(0, 0.05, 40), rng.uniform(0, 0.05, 60)
+    elif case == "near_floor":
+        treatment, control = rng.uniform(0, 0.002, 40), rng.uniform(0.0005, 0.0015, 60)
+    elif case == "ties":
+        treatment = rng.choice([0.0, 0.001, 0.01, 0.02], 40)
+        control = rng.choice([0.0, 0.001, 0.01, 0.02], 60)
+    elif case == "negative":
+        treatment, control = rng.uniform(-0.01, 0.03, 40), rng.uniform(-0.01, 0.03, 60)
+    else:
+        treatment, control = np.zeros(5), np.array([0.0, 0.0005, 0.002])
+    
+    assert engine._pairwise_rate_similarity(treatment, control) == pytest.approx(
+        naive_rate_similarity(treatment, control), abs=1e-9
+    )
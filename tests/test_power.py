@@ -0,0 +1,28 @@
+import pytest
+
+from models import PowerSimulationRequest, PowerSolverRequest, BudgetDesign
+
+from tests.conftest import synthetic_units, group_of
+
+def test_simulated_power_does_not_depend_on_worker_count(engine):
+    # Large enough to clear PARALLEL_MIN_CELLS, so n_jobs=2 really uses a pool
+    request = PowerSimulationRequest(units=synthetic_units(300, seed=1), n_simulations=1000, random_seed=7)
+    serial = engine.simulate_power(request.copy(update={"n_jobs": 1}))
+    pooled = engine.simulate_power(request.copy(update={"n_jobs": 2}))
+    assert serial.power == pooled.power
+    assert serial.critical_values == pooled.critical_values
+
+def test_bootstrap_metrics_do_not_depend_on_worker_count(engine):
+    units = synthetic_units(400, seed=2)
+    treatment, control = group_of(units[:200], "treatment"), group_of(units[200:], "control")
+    # 6000 resamples x 400 units clears PARALLEL_MIN_CELLS
+    serial = engine.resample_design_metrics(treatment, control, 6000, random_seed=3, n_jobs=1)
+    pooled = engine.resample_design_metrics(treatment, control, 6000, random_seed=3, n_jobs=4)
+    assert serial == pooled
+
+def test_budget_solver_rejects_designs_without_variance(engine):
+    units = synthetic_units(2, seed=4)
+    design = BudgetDesign(design_id="single", treatment_group=group_of(units[:1], "treatment"),
+                          control_group=group_of(units[1:], "control"), incremental_cpa=40.0)
+    with pytest.raises(ValueError, match="no conversion-rate variance"):
+        engine.solve_budget_for_power(PowerSolverRequest(designs=[design]))
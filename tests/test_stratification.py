@@ -0,0 +1,30 @@
+import numpy as np
+
+from models import OptimizationRequest
+
+from tests.conftest import synthetic_units
+
+def test_apportionment_spreads_tied_slots(engine):
+    sizes = np.full(10, 5)
+    for seed in range(20):
+        allocation = engine._apportion_treatment(sizes, 25, np.random.default_rng(seed))
+        assert allocation.sum() == 25
+        assert set(allocation) == {2, 3}
+        # Extra slots alternate over the ordered strata instead of filling the low ones
+        assert allocation[:5].sum() in (12, 13)
+
+def test_stratified_population_difference_has_no_consistent_sign(engine):
+    units = synthetic_units(50, seed=3)
+    population = np.array([unit.population for unit in units], dtype=float)
+    ids = [unit.id for unit in units]
+    
+    differences = []
+    for seed in range(12):
+        result = engine.optimize_geo_assignment(OptimizationRequest(
+            available_units=units, objectives=["conversions"], constraints={},
+            method="swap_search", stratify_by="population", random_seed=seed, n_jobs=1
+        ))
+        treated = np.isin(ids, result.treatment_units)
+        differences.append(population[treated].mean() - population[~treated].mean())
+    
+    assert min(differences) < 0 < max(differences)
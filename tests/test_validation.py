@@ -0,0 +1,40 @@
+import pytest
+
+from models import OptimizationRequest
+
+from tests.conftest import synthetic_units
+
+@pytest.mark.parametrize("options", [
+    {"method": "annealing"},
+    {"method": "milp"},
+    {"method": "swap_search", "n_chains": 4},
+    {"method": "swap_search", "stratify_by": "population"},
+])
+def test_multi_cell_rejects_options_it_would_ignore(engine, options):
+    request = OptimizationRequest(
+        available_units=synthetic_units(30), objectives=["conversions"], constraints={},
+        cell_proportions=[0.4, 0.3, 0.3], **options
+    )
+    with pytest.raises(ValueError):
+        engine.validate_request(request)
+
+def test_multi_cell_accepts_swap_search(engine):
+    engine.validate_request(OptimizationRequest(
+        available_units=synthetic_units(30), objectives=["conversions"], constraints={},
+        method="swap_search", cell_proportions=[0.4, 0.3, 0.3]
+    ))
+
+@pytest.mark.parametrize("options, cancellable", [
+    ({"method": "swap_search"}, True),
+    ({"method": "rerandomization"}, True),
+    ({"method": "swap_search", "cell_proportions": [0.5, 0.5]}, True),
+    ({"method": "milp"}, False),
+    ({"method": "matched_pairs"}, False),
+    ({"method": "swap_search", "n_chains": 4}, False),
+    ({"method": "swap_search", "stratify_by": "population"}, False),
+])
+def test_cancellation_only_offered_for_searches_that_poll_it(engine, options, cancellable):
+    request = OptimizationRequest(
+        available_units=synthetic_units(30), objectives=["conversions"], constraints={}, **options
+    )
+    assert engine.supports_cancellation(request) is cancellable